@@ -1,115 +1,519 @@
-import csv
-import json
-from pathlib import Path
-from collections import defaultdict
-
-def csv_to_nested_json(csv_path, output_folder="Output/JSON_Output"):
-    csv_path = Path(csv_path)
-    output_folder = Path(output_folder)
-    output_folder.mkdir(parents=True, exist_ok=True)
-
-    # Create JSON output file path
-    json_path = output_folder / (csv_path.stem + ".json")
-
-    with csv_path.open("r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        rows = list(reader)
-
-    # Group rows by ClaimID to build nested structure
-    claims_dict = defaultdict(lambda: {
-        "ClaimDetails": {},
-        "Payer": {},
-        "BillingProvider": {},
-        "Subscriber": {},
-        "RenderingProvider": {},
-        "ProcedureLines": []
-    })
-
-    # Iterate through the rows and build nested JSON
-    for row in rows:
-        claim_id = row.get("ClaimID", "")
-        claim = claims_dict[claim_id]
-
-        # ClaimDetails
-        claim["ClaimDetails"].update({
-            "ClaimID": row.get("ClaimID", ""),
-            "ClaimAmount": row.get("ClaimAmount", ""),
-            "PlaceOfService": row.get("PlaceOfService", ""),
-            "FacilityCode": row.get("FacilityCode", ""),
-            "PatientSignatureOnFile": row.get("PatientSignatureOnFile", ""),
-            "InsuranceAssignment": row.get("InsuranceAssignment", ""),
-            "ReleaseOfInformation": row.get("ReleaseOfInformation", ""),
-            "TreatmentResultingCode": row.get("TreatmentResultingCode", ""),
-            "ICN": row.get("ICN", "")
-        })
-
-        # Payer
-        claim["Payer"].update({
-            "Name": row.get("PayerName", ""),
-            "PayerID": row.get("PayerID", "")
-        })
-
-        # Billing Provider
-        claim["BillingProvider"].update({
-            "ProviderName": row.get("BillingProviderName", ""),
-            "NPI": row.get("BillingProviderNPI", ""),
-            "Address": row.get("BillingProviderAddress", ""),
-            "Address2": row.get("BillingProviderAddress2", ""),
-            "City": row.get("BillingProviderCity", ""),
-            "State": row.get("BillingProviderState", ""),
-            "Zip": row.get("BillingProviderZip", ""),
-            "TaxID": row.get("BillingProviderTaxID", ""),
-            "Taxonomy": row.get("BillingProviderTaxonomy", "")
-        })
-
-        # Subscriber
-        claim["Subscriber"].update({
-            "SubscriberID": row.get("SubscriberID", ""),
-            "LastName": row.get("SubscriberLastName", ""),
-            "FirstName": row.get("SubscriberFirstName", ""),
-            "Middle": row.get("SubscriberMiddle", ""),
-            "DOB": row.get("SubscriberDOB", ""),
-            "Gender": row.get("SubscriberGender", ""),
-            "Address": row.get("SubscriberAddress", ""),
-            "Address2": row.get("SubscriberAddress2", ""),
-            "City": row.get("SubscriberCity", ""),
-            "State": row.get("SubscriberState", ""),
-            "Zip": row.get("SubscriberZip", "")
-        })
-
-        # Rendering Provider
-        claim["RenderingProvider"].update({
-            "FirstName": row.get("RenderingProviderFirstName", ""),
-            "LastName": row.get("RenderingProviderLastName", ""),
-            "Middle": row.get("RenderingProviderMiddle", ""),
-            "NPI": row.get("RenderingProviderNPI", "")
-        })
-
-        # ProcedureLines (append each row as a line)
-        procedure_line = {
-            "ProcedureCode": row.get("ProcedureCode", ""),
-            "Fee": row.get("Fee", ""),
-            "Units": row.get("Units", ""),
-            "Quantity": row.get("Quantity", ""),
-            "ReplacementIndicator": row.get("ReplacementIndicator", ""),
-            "AreaOfOralCavity": row.get("AreaOfOralCavity", ""),
-            "DiagnosisCodePointer": row.get("DiagnosisCodePointer", ""),
-            "ToothNumber": row.get("ToothNumber", ""),
-            "ToothSurfaceCode": row.get("ToothSurfaceCode", ""),
-            "ToothSystem": row.get("ToothSystem", ""),
-            "ProcedureDate": row.get("ProcedureDate", "")
-        }
-        claim["ProcedureLines"].append(procedure_line)
-
-    # Convert dict to list
-    claims_list = list(claims_dict.values())
-
-    # Write JSON output
-    with json_path.open("w", encoding="utf-8") as f:
-        json.dump(claims_list, f, indent=4)
-
-    print(f"Nested JSON created at: {json_path}")
-    
-csv_file = "Output/CSV_Output/mockedDentalClaim.csv"
-csv_to_nested_json(csv_file)
-
+import csv
+import heapq
+import io
+import itertools
+import json
+import mmap
+import os
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from operator import itemgetter
+from pathlib import Path
+from collections import defaultdict
+
+from claim_io import JSONL_SUFFIX, encode_claim_line, write_claims_jsonl, write_encoded_jsonl
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Bytes of serialized rows (or claims) held in memory before a sorted run is spilled to disk
+SPILL_BYTES = 32 << 20
+
+# Target size of the byte ranges parallel ingestion hands to each worker task
+CHUNK_BYTES = 8 << 20
+
+# Claim sections whose values the last row of a claim decides
+CLAIM_SECTIONS = ("ClaimDetails", "Payer", "BillingProvider", "Subscriber", "RenderingProvider")
+
+# "json" is the indent=4 array; "jsonl" is the compact, indexed file claim_io.ClaimFile reads
+OUTPUT_FORMATS = ("json", "jsonl")
+
+
+class ClaimsNotGroupedError(Exception):
+    # Raised by iter_grouped_claims when a ClaimID shows up again after its group closed
+    pass
+
+
+class RecordBoundaryError(Exception):
+    # Raised by a parallel ingestion worker when its byte range ends inside a
+    # record, i.e. the quote-parity guess in split_csv_records was wrong
+    pass
+
+
+def new_claim():
+    return {
+        "ClaimDetails": {},
+        "Payer": {},
+        "BillingProvider": {},
+        "Subscriber": {},
+        "RenderingProvider": {},
+        "ProcedureLines": []
+    }
+
+
+def add_row(claim, row):
+    # ClaimDetails
+    claim["ClaimDetails"].update({
+        "ClaimID": row.get("ClaimID", ""),
+        "ClaimAmount": row.get("ClaimAmount", ""),
+        "PlaceOfService": row.get("PlaceOfService", ""),
+        "FacilityCode": row.get("FacilityCode", ""),
+        "PatientSignatureOnFile": row.get("PatientSignatureOnFile", ""),
+        "InsuranceAssignment": row.get("InsuranceAssignment", ""),
+        "ReleaseOfInformation": row.get("ReleaseOfInformation", ""),
+        "TreatmentResultingCode": row.get("TreatmentResultingCode", ""),
+        "ICN": row.get("ICN", "")
+    })
+
+    # Payer
+    claim["Payer"].update({
+        "Name": row.get("PayerName", ""),
+        "PayerID": row.get("PayerID", "")
+    })
+
+    # Billing Provider
+    claim["BillingProvider"].update({
+        "ProviderName": row.get("BillingProviderName", ""),
+        "NPI": row.get("BillingProviderNPI", ""),
+        "Address": row.get("BillingProviderAddress", ""),
+        "Address2": row.get("BillingProviderAddress2", ""),
+        "City": row.get("BillingProviderCity", ""),
+        "State": row.get("BillingProviderState", ""),
+        "Zip": row.get("BillingProviderZip", ""),
+        "TaxID": row.get("BillingProviderTaxID", ""),
+        "Taxonomy": row.get("BillingProviderTaxonomy", "")
+    })
+
+    # Subscriber
+    claim["Subscriber"].update({
+        "SubscriberID": row.get("SubscriberID", ""),
+        "LastName": row.get("SubscriberLastName", ""),
+        "FirstName": row.get("SubscriberFirstName", ""),
+        "Middle": row.get("SubscriberMiddle", ""),
+        "DOB": row.get("SubscriberDOB", ""),
+        "Gender": row.get("SubscriberGender", ""),
+        "Address": row.get("SubscriberAddress", ""),
+        "Address2": row.get("SubscriberAddress2", ""),
+        "City": row.get("SubscriberCity", ""),
+        "State": row.get("SubscriberState", ""),
+        "Zip": row.get("SubscriberZip", "")
+    })
+
+    # Rendering Provider
+    claim["RenderingProvider"].update({
+        "FirstName": row.get("RenderingProviderFirstName", ""),
+        "LastName": row.get("RenderingProviderLastName", ""),
+        "Middle": row.get("RenderingProviderMiddle", ""),
+        "NPI": row.get("RenderingProviderNPI", "")
+    })
+
+    # ProcedureLines (append each row as a line)
+    procedure_line = {
+        "ProcedureCode": row.get("ProcedureCode", ""),
+        "Fee": row.get("Fee", ""),
+        "Units": row.get("Units", ""),
+        "Quantity": row.get("Quantity", ""),
+        "ReplacementIndicator": row.get("ReplacementIndicator", ""),
+        "AreaOfOralCavity": row.get("AreaOfOralCavity", ""),
+        "DiagnosisCodePointer": row.get("DiagnosisCodePointer", ""),
+        "ToothNumber": row.get("ToothNumber", ""),
+        "ToothSurfaceCode": row.get("ToothSurfaceCode", ""),
+        "ToothSystem": row.get("ToothSystem", ""),
+        "ProcedureDate": row.get("ProcedureDate", "")
+    }
+    claim["ProcedureLines"].append(procedure_line)
+
+
+def peak_memory_mb():
+    # Peak resident set size of this process, or None where the platform can't tell us
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def iter_grouped_claims(rows):
+    # Rows must arrive grouped by ClaimID; each claim is yielded as soon as its group closes
+    closed = set()
+    claim_id = None
+    claim = None
+    for row in rows:
+        row_claim_id = row.get("ClaimID", "")
+        if claim is None or row_claim_id != claim_id:
+            if claim is not None:
+                yield claim
+                closed.add(claim_id)
+            if row_claim_id in closed:
+                raise ClaimsNotGroupedError(f"ClaimID {row_claim_id!r} is not contiguous in the input")
+            claim_id = row_claim_id
+            claim = new_claim()
+        add_row(claim, row)
+
+    if claim is not None:
+        yield claim
+
+
+def _sort_key(claim_id):
+    # None (short CSV rows) must stay a separate group from "", as it does in the dict path
+    return (claim_id is None, claim_id or "")
+
+
+def _spill_runs(records, key, tmp_dir, spill_bytes, prefix):
+    # Write records out as sorted runs of JSON lines and return the run paths.
+    # Records are held as their lines until spill_bytes of them build up, so a
+    # run costs about its size on disk, not that of the objects it came from.
+    runs = []
+    chunk = []
+    size = 0
+    for record in records:
+        line = json.dumps(record)
+        chunk.append((key(record), line))
+        size += len(line)
+        if size >= spill_bytes:
+            runs.append(_write_run(chunk, tmp_dir, f"{prefix}_{len(runs):05d}.jsonl"))
+            chunk = []
+            size = 0
+    if chunk:
+        runs.append(_write_run(chunk, tmp_dir, f"{prefix}_{len(runs):05d}.jsonl"))
+    return runs
+
+
+def _write_run(chunk, tmp_dir, name):
+    chunk.sort(key=itemgetter(0))
+    run_path = Path(tmp_dir) / name
+    with run_path.open("w", encoding="utf-8") as f:
+        for _, line in chunk:
+            f.write(line)
+            f.write("\n")
+    return run_path
+
+
+def _merge_runs(runs, key, stack):
+    readers = []
+    for run_path in runs:
+        f = stack.enter_context(run_path.open("r", encoding="utf-8"))
+        readers.append(json.loads(line) for line in f)
+    return heapq.merge(*readers, key=key)
+
+
+def iter_external_claims(rows, spill_bytes=SPILL_BYTES, tmp_dir=None):
+    # Bounded-memory grouping for rows in any order; claims come out in first-appearance order
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp, ExitStack() as stack:
+        # Pass 1: sorted runs of [ClaimID, row number, row values]. Values are
+        # listed in the first row's key order; a row with other keys (extra
+        # fields) is spilled as a dict.
+        fields = []
+
+        def numbered():
+            for seq, row in enumerate(rows):
+                if not fields:
+                    fields.extend(row)
+                values = list(row.values()) if list(row) == fields else row
+                yield [row.get("ClaimID", ""), seq, values]
+
+        row_key = lambda record: (_sort_key(record[0]), record[1])
+        row_runs = _spill_runs(numbered(), row_key, tmp, spill_bytes, "rows")
+
+        # Pass 2: merge the runs, build each claim, and spill runs of [first row number, claim]
+        def built_claims():
+            merged = _merge_runs(row_runs, row_key, stack)
+            for _, group in itertools.groupby(merged, key=lambda record: _sort_key(record[0])):
+                claim = new_claim()
+                first_seq = None
+                for _, seq, values in group:
+                    if first_seq is None:
+                        first_seq = seq
+                    add_row(claim, dict(zip(fields, values)) if isinstance(values, list) else values)
+                yield [first_seq, claim]
+
+        claim_runs = _spill_runs(built_claims(), itemgetter(0), tmp, spill_bytes, "claims")
+
+        # Pass 3: merge back into the order each ClaimID first appeared
+        for _, claim in _merge_runs(claim_runs, itemgetter(0), stack):
+            yield claim
+
+
+def encode_claim_json(claim):
+    # One claim as it appears inside the indent=4 array, already indented one level
+    return json.dumps(claim, indent=4).replace("\n", "\n    ")
+
+
+def tee_claims_json(claims, f):
+    # Passes claims through unchanged while streaming the same bytes
+    # json.dump(list(claims), f, indent=4) would produce
+    first = True
+    f.write("[")
+    for claim in claims:
+        f.write("\n    " if first else ",\n    ")
+        f.write(encode_claim_json(claim))
+        first = False
+        yield claim
+    f.write("]" if first else "\n]")
+
+
+def write_claims_json(claims, f):
+    for _ in tee_claims_json(claims, f):
+        pass
+
+
+def write_encoded_json(encoded, f):
+    # write_claims_json for claims already run through encode_claim_json
+    f.write("[")
+    first = True
+    for text in encoded:
+        f.write("\n    " if first else ",\n    ")
+        f.write(text)
+        first = False
+    f.write("]" if first else "\n]")
+
+
+# How each output format encodes one claim; parallel ingestion encodes in the workers
+CLAIM_ENCODERS = {"json": encode_claim_json, "jsonl": encode_claim_line}
+
+
+def _record_end(buf, pos, quotes):
+    # First record boundary after pos, given how many quote characters come
+    # before pos: a newline only ends a record when the quotes before it pair up
+    while True:
+        newline = buf.find(b"\n", pos)
+        if newline == -1:
+            return len(buf), quotes
+        quotes += buf[pos:newline].count(b'"')
+        pos = newline + 1
+        if quotes % 2 == 0:
+            return pos, quotes
+
+
+def _count_quotes(buf, start, end, block=1 << 20):
+    return sum(buf[i:min(i + block, end)].count(b'"') for i in range(start, end, block))
+
+
+def split_csv_records(csv_path, parts):
+    # (header end, [(start, end), ...]): byte ranges of the data rows, about
+    # parts of them. Quoted fields may hold newlines, so boundaries are found
+    # by quote parity, not by line. That is exact for RFC 4180 quoting, but a
+    # stray quote inside an unquoted field (which csv reads as a literal)
+    # throws the count off, so each range is checked as it is parsed (see
+    # _CheckedLines) before its rows are trusted.
+    size = os.path.getsize(csv_path)
+    if not size:
+        return 0, []
+    with open(csv_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        header_end, quotes = _record_end(mm, 0, 0)
+        bounds = [header_end]
+        for i in range(1, parts):
+            target = header_end + (size - header_end) * i // parts
+            if target <= bounds[-1]:
+                continue
+            quotes += _count_quotes(mm, bounds[-1], target)
+            end, quotes = _record_end(mm, target, quotes)
+            if end >= size:
+                break
+            bounds.append(end)
+        bounds.append(size)
+    return header_end, [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def _read_csv_range(csv_path, start, end):
+    # Text of one byte range, decoded and newline-translated exactly as
+    # open(csv_path, "r", encoding="utf-8") would have read it
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        return io.TextIOWrapper(io.BytesIO(f.read(end - start)), encoding="utf-8")
+
+
+class _CheckedLines:
+    # Feeds one range's lines to csv.reader and counts the reader's requests
+    # past the last one. At a record boundary it asks once and stops. Inside a
+    # quoted field it asks, hands back the cut-off record as if it were whole,
+    # then asks again, so a second request means the range ended mid-record.
+    # Ranges that start on a boundary and pass check() also end on one.
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.ends = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self.lines)
+        except StopIteration:
+            self.ends += 1
+            raise
+
+    def check(self):
+        if self.ends > 1:
+            raise RecordBoundaryError("CSV range ends inside a quoted field")
+
+
+def _read_fieldnames(csv_path, header_end):
+    lines = _CheckedLines(_read_csv_range(csv_path, 0, header_end))
+    reader = csv.reader(lines)
+    fieldnames = next(reader, [])
+    next(reader, None)
+    lines.check()
+    return fieldnames
+
+
+def _group_rows(rows, output_format):
+    # [(ClaimID, encoded claim)] for rows in any order, in first-appearance order
+    claims = {}
+    for row in rows:
+        claim_id = row.get("ClaimID", "")
+        claim = claims.get(claim_id)
+        if claim is None:
+            claim = claims[claim_id] = new_claim()
+        add_row(claim, row)
+    encode = CLAIM_ENCODERS[output_format]
+    return [(claim_id, encode(claim)) for claim_id, claim in claims.items()]
+
+
+def _group_csv_range(csv_path, fieldnames, start, end, output_format):
+    # Worker: [(ClaimID, encoded partial claim)] for the rows in one byte
+    # range. Claims go back already encoded, which is much cheaper to send
+    # between processes than the dicts, and keeps the JSON encoding off the
+    # parent too. Raises RecordBoundaryError if the range ends mid-record.
+    lines = _CheckedLines(_read_csv_range(csv_path, start, end))
+    claims = _group_rows(csv.DictReader(lines, fieldnames), output_format)
+    lines.check()
+    return claims
+
+
+def merge_claim_groups(groups, output_format):
+    # Folds partial groups, in file order, into whole claims. A claim split
+    # across ranges ends up as if its rows had been added one by one: the later
+    # range's section values win and its procedure lines go after the earlier
+    # ones. Only split claims are decoded and encoded again.
+    merged = {}
+    for group in groups:
+        for claim_id, encoded in group:
+            existing = merged.get(claim_id)
+            if existing is None:
+                merged[claim_id] = encoded
+                continue
+            if not isinstance(existing, dict):
+                existing = merged[claim_id] = json.loads(existing)
+            claim = json.loads(encoded)
+            for section in CLAIM_SECTIONS:
+                existing[section].update(claim[section])
+            existing["ProcedureLines"] += claim["ProcedureLines"]
+    encode = CLAIM_ENCODERS[output_format]
+    return [(claim_id, encode(value) if isinstance(value, dict) else value) for claim_id, value in merged.items()]
+
+
+def encode_claims_parallel(csv_path, output_format="json", workers=None, chunk_bytes=CHUNK_BYTES):
+    # (ClaimID, encoded claim) for every claim, in first-appearance order: the
+    # claims the in-memory path builds, with the CSV split into byte ranges
+    # that a process pool parses and encodes. Rows may come in any order.
+    # Every encoded claim is held until the last range is in, since any range
+    # may still add lines to any claim. The header starts on a boundary, and
+    # each range is only accepted if it ends on one, so by induction every
+    # range holds whole records; if one doesn't, the file is parsed in one pass.
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(csv_path)
+    header_end, ranges = split_csv_records(csv_path, max(workers, -(-size // chunk_bytes)))
+    if not ranges:
+        return []
+    try:
+        fieldnames = _read_fieldnames(csv_path, header_end)
+        starts, ends = zip(*ranges)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map yields in submission order, so groups are merged in file order
+            groups = pool.map(_group_csv_range, itertools.repeat(csv_path), itertools.repeat(fieldnames), starts,
+                              ends, itertools.repeat(output_format))
+            return merge_claim_groups(groups, output_format)
+    except RecordBoundaryError as e:
+        print(f"{e}; parsing {csv_path} in a single pass")
+    with open(csv_path, "r", encoding="utf-8") as f:
+        return _group_rows(csv.DictReader(f), output_format)
+
+
+def csv_to_nested_json(csv_path, output_folder="Output/JSON_Output", stream=False, spill_bytes=SPILL_BYTES,
+                       output_format="json", workers=None):
+    # workers parses the CSV in that many processes (see encode_claims_parallel)
+    # and writes the same file; it holds every claim in memory, so it ignores stream
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r} (use one of {', '.join(OUTPUT_FORMATS)})")
+    csv_path = Path(csv_path)
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+
+    # Create JSON output file path
+    json_path = output_folder / (csv_path.stem + "." + output_format)
+
+    if workers:
+        records = encode_claims_parallel(csv_path, output_format, workers)
+        if output_format == "jsonl":
+            write_encoded_jsonl(records, json_path)
+        else:
+            with json_path.open("w", encoding="utf-8") as f:
+                write_encoded_json((text for _, text in records), f)
+        print(f"Nested JSON created at: {json_path}")
+        return json_path
+
+    if stream:
+        _stream_csv_to_json(csv_path, json_path, spill_bytes)
+        print(f"Nested JSON created at: {json_path}")
+        peak = peak_memory_mb()
+        if peak is not None:
+            print(f"Peak memory: {peak:.1f} MB")
+        return json_path
+
+    with csv_path.open("r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+
+    # Group rows by ClaimID to build nested structure
+    claims_dict = defaultdict(new_claim)
+
+    # Iterate through the rows and build nested JSON
+    for row in rows:
+        add_row(claims_dict[row.get("ClaimID", "")], row)
+
+    # Convert dict to list
+    claims_list = list(claims_dict.values())
+
+    # Write JSON output
+    if output_format == "jsonl":
+        write_claims_jsonl(claims_list, json_path)
+    else:
+        with json_path.open("w", encoding="utf-8") as f:
+            json.dump(claims_list, f, indent=4)
+
+    print(f"Nested JSON created at: {json_path}")
+    return json_path
+
+
+def _stream_csv_to_json(csv_path, json_path, spill_bytes):
+    # Optimistically assume the export is grouped by ClaimID, and fall back to
+    # external grouping (rewriting the output from scratch) the moment it isn't
+    try:
+        with csv_path.open("r", encoding="utf-8") as f:
+            _write_claims(iter_grouped_claims(csv.DictReader(f)), json_path)
+        return
+    except ClaimsNotGroupedError as e:
+        print(f"{e}; falling back to external grouping")
+
+    with csv_path.open("r", encoding="utf-8") as f:
+        _write_claims(iter_external_claims(csv.DictReader(f), spill_bytes, tmp_dir=json_path.parent), json_path)
+
+
+def _write_claims(claims, json_path):
+    if json_path.suffix == JSONL_SUFFIX:
+        write_claims_jsonl(claims, json_path)
+        return
+    with json_path.open("w", encoding="utf-8") as out:
+        write_claims_json(claims, out)
+
+
+if __name__ == "__main__":
+    csv_file = "Output/CSV_Output/mockedDentalClaim.csv"
+    csv_to_nested_json(csv_file)
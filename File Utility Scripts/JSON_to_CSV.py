@@ -1,9 +1,102 @@
 import os 
+import argparse
 import csv
-import json
 from pathlib import Path
 
-def json_to_csv(json_path, output_folder="Output/CSV_Output"):
+from claim_io import iter_claims
+
+# Rows handed to csv.writer.writerows at a time
+CHUNK_ROWS = 10_000
+
+# CSV column -> (claim section, key); section None means the procedure line itself
+COLUMN_SOURCES = {
+    "ClaimID": ("ClaimDetails", "ClaimID"),
+    "ClaimAmount": ("ClaimDetails", "ClaimAmount"),
+    "PlaceOfService": ("ClaimDetails", "PlaceOfService"),
+    "FacilityCode": ("ClaimDetails", "FacilityCode"),
+    "PatientSignatureOnFile": ("ClaimDetails", "PatientSignatureOnFile"),
+    "InsuranceAssignment": ("ClaimDetails", "InsuranceAssignment"),
+    "ReleaseOfInformation": ("ClaimDetails", "ReleaseOfInformation"),
+    "TreatmentResultingCode": ("ClaimDetails", "TreatmentResultingCode"),
+    "ICN": ("ClaimDetails", "ICN"),
+    "PayerName": ("Payer", "Name"),
+    "PayerID": ("Payer", "PayerID"),
+    "BillingProviderName": ("BillingProvider", "ProviderName"),
+    "BillingProviderNPI": ("BillingProvider", "NPI"),
+    "BillingProviderAddress": ("BillingProvider", "Address"),
+    "BillingProviderAddress2": ("BillingProvider", "Address2"),
+    "BillingProviderCity": ("BillingProvider", "City"),
+    "BillingProviderState": ("BillingProvider", "State"),
+    "BillingProviderZip": ("BillingProvider", "Zip"),
+    "BillingProviderTaxID": ("BillingProvider", "TaxID"),
+    "BillingProviderTaxonomy": ("BillingProvider", "Taxonomy"),
+    "SubscriberID": ("Subscriber", "SubscriberID"),
+    "SubscriberLastName": ("Subscriber", "LastName"),
+    "SubscriberFirstName": ("Subscriber", "FirstName"),
+    "SubscriberMiddle": ("Subscriber", "Middle"),
+    "SubscriberDOB": ("Subscriber", "DOB"),
+    "SubscriberGender": ("Subscriber", "Gender"),
+    "SubscriberAddress": ("Subscriber", "Address"),
+    "SubscriberAddress2": ("Subscriber", "Address2"),
+    "SubscriberCity": ("Subscriber", "City"),
+    "SubscriberState": ("Subscriber", "State"),
+    "SubscriberZip": ("Subscriber", "Zip"),
+    "RenderingProviderFirstName": ("RenderingProvider", "FirstName"),
+    "RenderingProviderLastName": ("RenderingProvider", "LastName"),
+    "RenderingProviderMiddle": ("RenderingProvider", "Middle"),
+    "RenderingProviderNPI": ("RenderingProvider", "NPI"),
+    "ProcedureCode": (None, "ProcedureCode"),
+    "Fee": (None, "Fee"),
+    "Units": (None, "Units"),
+    "Quantity": (None, "Quantity"),
+    "ReplacementIndicator": (None, "ReplacementIndicator"),
+    "AreaOfOralCavity": (None, "AreaOfOralCavity"),
+    "DiagnosisCodePointer": (None, "DiagnosisCodePointer"),
+    "ToothNumber": (None, "ToothNumber"),
+    "ToothSurfaceCode": (None, "ToothSurfaceCode"),
+    "ToothSystem": (None, "ToothSystem"),
+    "ProcedureDate": (None, "ProcedureDate"),
+}
+
+FIELDNAMES = list(COLUMN_SOURCES)
+
+
+def compile_row_extractor(columns=FIELDNAMES):
+    # Builds extract(claim) -> [row tuple per procedure line] for the given
+    # columns. Claim-level values are read once per claim rather than once per
+    # line, and each row is a plain tuple in column order.
+    unknown = [column for column in columns if column not in COLUMN_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown CSV columns: {', '.join(unknown)}")
+
+    lines = ["def extract(claim):"]
+    sections = {}
+    values = []
+    for i, column in enumerate(columns):
+        section, key = COLUMN_SOURCES[column]
+        if section is None:
+            values.append(f"line.get({key!r}, '')")
+            continue
+        if section not in sections:
+            sections[section] = f"s{len(sections)}"
+            lines.append(f"    {sections[section]} = claim[{section!r}]")
+        lines.append(f"    v{i} = {sections[section]}.get({key!r}, '')")
+        values.append(f"v{i}")
+    lines.append(f"    return [({', '.join(values)},) for line in claim['ProcedureLines']]")
+
+    namespace = {}
+    exec(compile("\n".join(lines), "<csv row extractor>", "exec"), namespace)
+    extract = namespace["extract"]
+    extract.source = "\n".join(lines)
+    return extract
+
+
+def json_to_csv(json_path, output_folder="Output/CSV_Output", columns=None, chunk_rows=CHUNK_ROWS):
+    # Streams claims out of the JSON (or .jsonl) file and writes one CSV row per procedure
+    # line. columns picks (and orders) the exported columns; all 46 by default.
+    columns = list(columns or FIELDNAMES)
+    extract = compile_row_extractor(columns)
+
     # Ensure the output folder exists
     output_folder = Path(output_folder)
     output_folder.mkdir(parents=True, exist_ok=True)
@@ -13,95 +106,33 @@ def json_to_csv(json_path, output_folder="Output/CSV_Output"):
     # Define the path for the output CSV
     csv_path = output_folder / (base_name + ".csv")
 
-    with open(json_path, 'r', encoding="utf-8") as f:
-        data = json.load(f)
-
     # Open CSV file for writing
     with open(csv_path, 'w', newline='', encoding="utf-8") as csvfile:
-        fieldnames = [
-            "ClaimID", "ClaimAmount", "PlaceOfService", "FacilityCode", "PatientSignatureOnFile", 
-            "InsuranceAssignment", "ReleaseOfInformation", "TreatmentResultingCode", "ICN", 
-            "PayerName", "PayerID", 
-            "BillingProviderName", "BillingProviderNPI", "BillingProviderAddress", "BillingProviderAddress2", 
-            "BillingProviderCity", "BillingProviderState", "BillingProviderZip", "BillingProviderTaxID", 
-            "BillingProviderTaxonomy",
-            "SubscriberID", "SubscriberLastName", "SubscriberFirstName", "SubscriberMiddle", "SubscriberDOB", 
-            "SubscriberGender", "SubscriberAddress", "SubscriberAddress2", "SubscriberCity", "SubscriberState", 
-            "SubscriberZip", 
-            "RenderingProviderFirstName", "RenderingProviderLastName", "RenderingProviderMiddle", 
-            "RenderingProviderNPI", 
-            "ProcedureCode", "Fee", "Units", "Quantity", "ReplacementIndicator", "AreaOfOralCavity", 
-            "DiagnosisCodePointer", "ToothNumber", "ToothSurfaceCode", "ToothSystem", "ProcedureDate"
-        ]
-        
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        # Process each claim
-        for claim in data:
-            claim_details = claim["ClaimDetails"]
-            payer = claim["Payer"]
-            billing_provider = claim["BillingProvider"]
-            subscriber = claim["Subscriber"]
-            rendering_provider = claim["RenderingProvider"]
-            procedure_lines = claim["ProcedureLines"]
-
-            # For each procedure line, we'll write a separate row in the CSV
-            for procedure in procedure_lines:
-                row = {
-                    "ClaimID": claim_details.get("ClaimID", ""),
-                    "ClaimAmount": claim_details.get("ClaimAmount", ""),
-                    "PlaceOfService": claim_details.get("PlaceOfService", ""),
-                    "FacilityCode": claim_details.get("FacilityCode", ""),
-                    "PatientSignatureOnFile": claim_details.get("PatientSignatureOnFile", ""),
-                    "InsuranceAssignment": claim_details.get("InsuranceAssignment", ""),
-                    "ReleaseOfInformation": claim_details.get("ReleaseOfInformation", ""),
-                    "TreatmentResultingCode": claim_details.get("TreatmentResultingCode", ""),
-                    "ICN": claim_details.get("ICN", ""),
-                    "PayerName": payer.get("Name", ""),
-                    "PayerID": payer.get("PayerID", ""),
-                    "BillingProviderName": billing_provider.get("ProviderName", ""),
-                    "BillingProviderNPI": billing_provider.get("NPI", ""),
-                    "BillingProviderAddress": billing_provider.get("Address", ""),
-                    "BillingProviderAddress2": billing_provider.get("Address2", ""),
-                    "BillingProviderCity": billing_provider.get("City", ""),
-                    "BillingProviderState": billing_provider.get("State", ""),
-                    "BillingProviderZip": billing_provider.get("Zip", ""),
-                    "BillingProviderTaxID": billing_provider.get("TaxID", ""),
-                    "BillingProviderTaxonomy": billing_provider.get("Taxonomy", ""),
-                    "SubscriberID": subscriber.get("SubscriberID", ""),
-                    "SubscriberLastName": subscriber.get("LastName", ""),
-                    "SubscriberFirstName": subscriber.get("FirstName", ""),
-                    "SubscriberMiddle": subscriber.get("Middle", ""),
-                    "SubscriberDOB": subscriber.get("DOB", ""),
-                    "SubscriberGender": subscriber.get("Gender", ""),
-                    "SubscriberAddress": subscriber.get("Address", ""),
-                    "SubscriberAddress2": subscriber.get("Address2", ""),
-                    "SubscriberCity": subscriber.get("City", ""),
-                    "SubscriberState": subscriber.get("State", ""),
-                    "SubscriberZip": subscriber.get("Zip", ""),
-                    "RenderingProviderFirstName": rendering_provider.get("FirstName", ""),
-                    "RenderingProviderLastName": rendering_provider.get("LastName", ""),
-                    "RenderingProviderMiddle": rendering_provider.get("Middle", ""),
-                    "RenderingProviderNPI": rendering_provider.get("NPI", ""),
-                    "ProcedureCode": procedure.get("ProcedureCode", ""),
-                    "Fee": procedure.get("Fee", ""),
-                    "Units": procedure.get("Units", ""),
-                    "Quantity": procedure.get("Quantity", ""),
-                    "ReplacementIndicator": procedure.get("ReplacementIndicator", ""),
-                    "AreaOfOralCavity": procedure.get("AreaOfOralCavity", ""),
-                    "DiagnosisCodePointer": procedure.get("DiagnosisCodePointer", ""),
-                    "ToothNumber": procedure.get("ToothNumber", ""),
-                    "ToothSurfaceCode": procedure.get("ToothSurfaceCode", ""),
-                    "ToothSystem": procedure.get("ToothSystem", ""),
-                    "ProcedureDate": procedure.get("ProcedureDate", "")
-                }
-
-                # Write row to CSV
-                writer.writerow(row)
+        writer = csv.writer(csvfile)
+        writer.writerow(columns)
+
+        # Rows are buffered and written in chunks
+        pending = []
+        for claim in iter_claims(json_path):
+            pending += extract(claim)
+            if len(pending) >= chunk_rows:
+                writer.writerows(pending)
+                pending = []
+        writer.writerows(pending)
 
     print(f"CSV file created at: {csv_path}")
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flatten nested claim JSON back to one CSV row per procedure line.")
+    parser.add_argument("json_path", nargs="?", default="Output/JSON_Output/mockedDentalClaim.json")
+    parser.add_argument("--output-folder", default="Output/CSV_Output")
+    parser.add_argument("--columns", nargs="+", choices=FIELDNAMES, metavar="COLUMN",
+                        help="export only these columns, in this order")
+    args = parser.parse_args(argv)
+    json_to_csv(args.json_path, args.output_folder, args.columns)
 
-json_file = "Output/JSON_Output/mockedDentalClaim.json"
-json_to_csv(json_file)
 
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import argparse
+import time as clock
+from datetime import datetime
+
+from claim_io import iter_json_claims
+from generateDentalX12_Batch import get_field
+from x12_templates import render_claim
+
+
+def format_x12_date(date_str):
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y%m%d")
+    except:
+        return ""
+
+
+def legacy_render_claim(claim, full_date, time):
+    # The per-claim body as both generators rendered it before x12_templates,
+    # kept here as the baseline for the comparison
+    x12_output = []
+    x12_output.append(f"BHT*0019*00*{get_field(claim, 'ClaimDetails', 'ClaimID')}*{full_date}*{time}*CH~")
+    x12_output.append("NM1*41*2*Organization Name*****46*WTPID000007~")
+    x12_output.append("PER*IC*Help Desk*TE*18005551234~")
+    x12_output.append(f"NM1*40*2*{get_field(claim, 'Payer', 'Name')}*****46*{get_field(claim, 'Payer', 'PayerID')}~")
+
+    x12_output.append("HL*1**20*1~")
+    x12_output.append(f"NM1*85*2*{get_field(claim, 'BillingProvider', 'ProviderName')}*****XX*{get_field(claim, 'BillingProvider', 'NPI')}~")
+    addr2 = get_field(claim, 'BillingProvider', 'Address2')
+    if addr2:
+        x12_output.append(f"N3*{get_field(claim, 'BillingProvider', 'Address')}*{addr2}~")
+    else:
+        x12_output.append(f"N3*{get_field(claim, 'BillingProvider', 'Address')}~")
+    x12_output.append(f"N4*{get_field(claim, 'BillingProvider', 'City')}*{get_field(claim, 'BillingProvider', 'State')}*{get_field(claim, 'BillingProvider', 'Zip')}~")
+    x12_output.append(f"REF*EI*{get_field(claim, 'BillingProvider', 'TaxID')}~")
+
+    x12_output.append("HL*2*1*22*0~")
+    x12_output.append("SBR*S*18******MA~")
+    x12_output.append(f"NM1*IL*1*{get_field(claim, 'Subscriber', 'LastName')}*{get_field(claim, 'Subscriber', 'FirstName')}*{get_field(claim, 'Subscriber', 'Middle')}**MI*{get_field(claim, 'Subscriber', 'SubscriberID')}~")
+    addr2 = get_field(claim, 'Subscriber', 'Address2')
+    if addr2:
+        x12_output.append(f"N3*{get_field(claim, 'Subscriber', 'Address')}*{addr2}~")
+    else:
+        x12_output.append(f"N3*{get_field(claim, 'Subscriber', 'Address')}~")
+    x12_output.append(f"N4*{get_field(claim, 'Subscriber', 'City')}*{get_field(claim, 'Subscriber', 'State')}*{get_field(claim, 'Subscriber', 'Zip')}~")
+    x12_output.append(f"DMG*D8*{format_x12_date(get_field(claim, 'Subscriber', 'DOB'))}*{get_field(claim, 'Subscriber', 'Gender')}~")
+    x12_output.append(f"NM1*PR*2*{get_field(claim, 'Payer', 'Name')}*****PI*{get_field(claim, 'Payer', 'PayerID')}~")
+
+    facility_code = get_field(claim, 'ClaimDetails', 'FacilityCode') or 'B'
+    treatment_code = get_field(claim, 'ClaimDetails', 'TreatmentResultingCode') or 'B'
+    x12_output.append(f"CLM*{get_field(claim, 'ClaimDetails', 'ClaimID')}*{get_field(claim, 'ClaimDetails', 'ClaimAmount')}***{get_field(claim, 'ClaimDetails', 'PlaceOfService')}:{facility_code}:1*Y*A*Y*Y*{treatment_code}~")
+
+    x12_output.append(f"NM1*82*1*{get_field(claim, 'RenderingProvider', 'LastName')}*{get_field(claim, 'RenderingProvider', 'FirstName')}*{get_field(claim, 'RenderingProvider', 'Middle')}**XX*{get_field(claim, 'RenderingProvider', 'NPI')}~")
+    x12_output.append(f"PRV*PE*PXC*{get_field(claim, 'BillingProvider', 'Taxonomy')}~")
+
+    lx_counter = 1
+    for line in get_field(claim, 'ProcedureLines', default=[]):
+        x12_output.append(f"LX*{lx_counter}~")
+        x12_output.append(f"SV3*AD:{get_field(line,'ProcedureCode')}*{get_field(line,'Fee')}**{get_field(line,'AreaOfOralCavity')}*{get_field(line,'ReplacementIndicator')}*{get_field(line,'Quantity')}*~")
+        x12_output.append(f"DTP*472*D8*{format_x12_date(get_field(line, 'ProcedureDate'))}~")
+        tooth_num = get_field(line, 'ToothNumber')
+        tooth_surf = get_field(line, 'ToothSurfaceCode')
+        tooth_system = get_field(line, 'ToothSystem', default='JP')
+        if tooth_num or tooth_surf:
+            x12_output.append(f"TOO*{tooth_system}*{tooth_num}*{tooth_surf}~")
+        lx_counter += 1
+    return x12_output
+
+
+def time_render(render, claims, full_date, time, repeat):
+    best = None
+    for _ in range(repeat):
+        start = clock.perf_counter()
+        for claim in claims:
+            render(claim, full_date, time)
+        elapsed = clock.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare per-claim 837D render time against the legacy get_field code.")
+    parser.add_argument("json_path", nargs="?", default="Output/JSON_Data/mockedDentalClaim.json")
+    parser.add_argument("--claims", type=int, default=20000, help="claims rendered per timing run")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs; the fastest is reported")
+    args = parser.parse_args(argv)
+
+    sample = list(iter_json_claims(args.json_path))
+    claims = [sample[i % len(sample)] for i in range(args.claims)]
+    now = datetime.now()
+    full_date = now.strftime("%Y%m%d")
+    time = now.strftime("%H%M")
+
+    for claim in sample:
+        if render_claim(claim, full_date, time) != legacy_render_claim(claim, full_date, time):
+            raise SystemExit(f"Template output differs from legacy output for {get_field(claim, 'ClaimDetails', 'ClaimID')}")
+
+    legacy = time_render(legacy_render_claim, claims, full_date, time, args.repeat)
+    compiled = time_render(render_claim, claims, full_date, time, args.repeat)
+    print(f"legacy get_field render: {legacy / len(claims) * 1e6:8.2f} us/claim")
+    print(f"compiled templates:      {compiled / len(claims) * 1e6:8.2f} us/claim")
+    print(f"speedup:                 {legacy / compiled:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
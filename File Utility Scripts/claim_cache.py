@@ -0,0 +1,242 @@
+import hashlib
+import itertools
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+from x12_templates import TEMPLATE_VERSION
+
+DEFAULT_CACHE_PATH = "Output/Cache/claim_blocks.sqlite3"
+# Rendered text kept in the cache before the least recently used claims are evicted
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+# Claims looked up in one query
+LOOKUP_CHUNK = 500
+# A hit only refreshes last_used once it is this many seconds old; eviction
+# doesn't need finer grain, and rewriting every hit costs more than rendering
+TOUCH_SECONDS = 24 * 60 * 60
+
+
+# Keys the digests, so blocks rendered from older templates never match
+_DIGEST_KEY = TEMPLATE_VERSION.encode("ascii")
+# json.dumps() with options builds a new encoder every call
+_encode_stub = json.JSONEncoder(separators=(",", ":"), ensure_ascii=False).encode
+
+
+def record_digest(record):
+    # Hash of a claim's raw record (claim_io.iter_claim_records) under the current templates
+    if isinstance(record, str):
+        record = record.encode("utf-8")
+    return hashlib.blake2b(record, digest_size=16, key=_DIGEST_KEY).digest()
+
+
+def claim_digest(claim):
+    # record_digest for a claim that was never a record: its normalized JSON.
+    # Serializing costs about as much as rendering, so read claims through
+    # ClaimBlockCache.read() wherever they come from a file.
+    return record_digest(json.dumps(claim, sort_keys=True, separators=(",", ":"), ensure_ascii=False))
+
+
+class ClaimBlockCache:
+    # Persistent (ClaimID, renderer) -> rendered segment block cache. A block
+    # is reused only when the claim's digest is unchanged; envelopes, BHT
+    # timestamps and trailer counts are always recomputed by the caller around it.
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._record_digests = {}
+        self._blocks = {}
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # Clustered on the key, so a lookup reads the block straight off the key's b-tree
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS claim_blocks ("
+            " kind TEXT NOT NULL,"
+            " claim_id TEXT NOT NULL,"
+            " digest BLOB NOT NULL,"
+            " block TEXT NOT NULL,"
+            " segments INTEGER NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " stub TEXT NOT NULL,"
+            " lines INTEGER NOT NULL,"
+            " PRIMARY KEY (kind, claim_id)) WITHOUT ROWID"
+        )
+        # Covers evict(), which then never reads the blocks themselves
+        self._conn.execute("CREATE INDEX IF NOT EXISTS claim_blocks_last_used ON claim_blocks (last_used, size)")
+
+    def read(self, records):
+        # Passes the claims of (claim, raw record) pairs through, keeping the
+        # record's digest for iter_blocks so the claim is never re-serialized.
+        # Digests are held against the claim object until it is rendered.
+        for claim, record in records:
+            self._record_digests[id(claim)] = (claim, record_digest(record))
+            yield claim
+
+    def read_indexed(self, records, kind, fields):
+        # For (ClaimID, line) pairs from claim_io.iter_indexed_records, whose
+        # blocks will come from iter_blocks(..., kind, fields). A claim whose
+        # line is unchanged is matched on its ClaimID and the line's digest
+        # without being decoded, and passed on as a stub (see _stub) that
+        # iter_blocks already holds the block for. Only new or changed lines
+        # are decoded.
+        paths = [path.split(".", 1) for path in fields]
+        records = iter(records)
+        while True:
+            chunk = list(itertools.islice(records, LOOKUP_CHUNK))
+            if not chunk:
+                return
+            now = time.time()
+            keys = [(None if claim_id is None else str(claim_id), record_digest(line)) for claim_id, line in chunk]
+            cached = self._lookup([claim_id for claim_id, _ in keys if claim_id is not None], kind)
+            rows = [cached.get(claim_id) for claim_id, _ in keys]
+            rows = [row if row is not None and row[0] == digest else None for row, (_, digest) in zip(rows, keys)]
+            # One decode for all the chunk's stubs; per call, the overhead outweighs the parsing
+            stubs = iter(json.loads("[" + ",".join(row[4] for row in rows if row is not None) + "]"))
+            touched = []
+            for (_, line), (claim_id, digest), row in zip(chunk, keys, rows):
+                values = next(stubs) if row is not None else None
+                # A stub kept for other fields can't stand in for the claim
+                if values is not None and len(values) == len(paths):
+                    self.hits += 1
+                    claim = _stub(paths, values, row[5])
+                    self._blocks[id(claim)] = (claim, row[1], row[2])
+                    if now - row[3] > TOUCH_SECONDS:
+                        touched.append(claim_id)
+                else:
+                    claim = json.loads(line)
+                    self._record_digests[id(claim)] = (claim, digest)
+                yield claim
+            self._touch(kind, touched, now)
+
+    def _digest(self, claim):
+        entry = self._record_digests.pop(id(claim), None)
+        return entry[1] if entry is not None else claim_digest(claim)
+
+    def iter_blocks(self, claims, render, kind, fields=()):
+        # Yields (claim, block, segment_count) in input order, rendering only
+        # claims that are new or changed since they were cached. fields are the
+        # "Section.Key" paths the caller reads from a claim besides its block,
+        # kept with the block for read_indexed's stubs.
+        paths = [path.split(".", 1) for path in fields]
+        claims = iter(claims)
+        while True:
+            chunk = list(itertools.islice(claims, LOOKUP_CHUNK))
+            if not chunk:
+                return
+            now = time.time()
+            # Stubs from read_indexed come with their blocks; the rest are looked up
+            found = [self._blocks.pop(id(claim), None) for claim in chunk]
+            keys = [(_claim_id(claim), self._digest(claim)) for claim, block in zip(chunk, found) if block is None]
+            cached = self._lookup([claim_id for claim_id, _ in keys], kind)
+
+            # The chunk is stored before any of it is yielded, since callers
+            # may stop pulling blocks as soon as they have the last claim.
+            # Everything is committed in one go by close().
+            blocks, touched, stored = [], [], []
+            keys = iter(keys)
+            for claim, block in zip(chunk, found):
+                if block is not None:
+                    blocks.append(block)
+                    continue
+                claim_id, digest = next(keys)
+                row = cached.get(claim_id)
+                if row is not None and row[0] == digest:
+                    self.hits += 1
+                    block, count = row[1], row[2]
+                    if now - row[3] > TOUCH_SECONDS:
+                        touched.append(claim_id)
+                else:
+                    self.misses += 1
+                    segments = render(claim)
+                    block, count = "\n".join(segments), len(segments)
+                    stored.append((kind, claim_id, digest, block, count, len(block), now) + _stub_record(claim, paths))
+                blocks.append((claim, block, count))
+
+            self._touch(kind, touched, now)
+            self._conn.executemany("INSERT OR REPLACE INTO claim_blocks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   stored)
+            yield from blocks
+
+    def _touch(self, kind, claim_ids, now):
+        if claim_ids:
+            self._conn.execute(f"UPDATE claim_blocks SET last_used = ? WHERE kind = ? AND claim_id IN"
+                               f" ({','.join('?' * len(claim_ids))})", [now, kind] + claim_ids)
+
+    def _lookup(self, claim_ids, kind):
+        if not claim_ids:
+            return {}
+        placeholders = ",".join("?" * len(claim_ids))
+        rows = self._conn.execute(
+            f"SELECT claim_id, digest, block, segments, last_used, stub, lines"
+            f" FROM claim_blocks"
+            f" WHERE kind = ? AND claim_id IN ({placeholders})", [kind] + claim_ids
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    def evict(self):
+        # Drop least recently used blocks until the cache fits in max_bytes
+        self._conn.commit()
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM claim_blocks").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+        doomed = []
+        for kind, claim_id, size in self._conn.execute("SELECT kind, claim_id, size FROM claim_blocks ORDER BY last_used"):
+            if total <= self.max_bytes:
+                break
+            doomed.append((kind, claim_id))
+            total -= size
+        with self._conn:
+            self._conn.executemany("DELETE FROM claim_blocks WHERE kind = ? AND claim_id = ?", doomed)
+        self.evicted += len(doomed)
+        return len(doomed)
+
+    def close(self):
+        self.evict()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _claim_id(claim):
+    details = claim.get("ClaimDetails") if isinstance(claim, dict) else None
+    claim_id = details.get("ClaimID", "") if isinstance(details, dict) else ""
+    return str(claim_id)
+
+
+def _stub_record(claim, paths):
+    # (stub, procedure line count) for _stub: the JSON list of the claim's
+    # values at paths, "" where a section or key is missing, as the templates
+    # and get_field read them
+    values = []
+    lines = None
+    if isinstance(claim, dict):
+        for section, key in paths:
+            fields = claim.get(section)
+            values.append(fields.get(key, "") if isinstance(fields, dict) else "")
+        lines = claim.get("ProcedureLines")
+    else:
+        values = [""] * len(paths)
+    return _encode_stub(values), len(lines or ())
+
+
+def _stub(paths, values, lines):
+    # Stands in for an unchanged claim whose block is cached: just the fields
+    # its stub kept. Its procedure lines are empty placeholders, there so line
+    # counts stay right.
+    claim = {"ProcedureLines": [{}] * lines}
+    for (section, key), value in zip(paths, values):
+        fields = claim.get(section)
+        if fields is None:
+            fields = claim[section] = {}
+        fields[key] = value
+    return claim
@@ -0,0 +1,357 @@
+import itertools
+import json
+import mmap
+import re
+from pathlib import Path
+
+# Characters read from disk per refill while scanning a claims array
+READ_CHUNK = 1 << 20
+# Sidecar index lines decoded at a time by iter_indexed_records
+INDEX_CHUNK = 1000
+
+_WHITESPACE = re.compile(r"\s*")
+# Characters before the end of the read buffer within which a decode error
+# may just be a token cut off by the read, e.g. a \uXXXX surrogate pair
+_TOKEN_MARGIN = 16
+# Between claims in a byte range of a claims array
+_SEPARATORS = re.compile(r"[\s,\[]*")
+# How json.dump(indent=4) opens each element of a top-level array
+_INDENTED_CLAIM = b"\n    {"
+
+# Compact claim files: one claim per line as minified JSON, so a claim can be
+# found by byte offset. The sidecar index maps ClaimID to (offset, length).
+JSONL_SUFFIX = ".jsonl"
+INDEX_SUFFIX = ".idx"
+
+
+def iter_json_claims(json_path, chunk_size=READ_CHUNK):
+    # Yields the elements of a top-level JSON array one at a time, so a claims
+    # file never has to be held in memory as a whole
+    for claim, _ in iter_json_records(json_path, chunk_size):
+        yield claim
+
+
+def iter_json_records(json_path, chunk_size=READ_CHUNK):
+    # iter_json_claims, paired with each element's text as it appears in the file
+    decoder = json.JSONDecoder()
+    with open(json_path, "r", encoding="utf-8") as f:
+        # offset is the file position, in characters, of buf[0]
+        offset = 0
+        buf = f.read(chunk_size)
+        pos = _WHITESPACE.match(buf).end()
+        while buf and pos == len(buf):
+            offset += len(buf)
+            buf = f.read(chunk_size)
+            pos = _WHITESPACE.match(buf).end()
+        eof = not buf
+        if buf[pos:pos + 1] != "[":
+            raise ValueError(f"{json_path} does not contain a JSON array")
+        pos += 1
+        expect_comma = False
+
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+
+            # Keep at least one full token in the buffer before deciding what's next
+            if pos == len(buf) and not eof:
+                offset += len(buf)
+                buf = f.read(chunk_size)
+                eof = not buf
+                pos = 0
+                continue
+
+            char = buf[pos:pos + 1]
+            if char == "]":
+                return
+            if expect_comma:
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' in {json_path}, found {char!r}")
+                pos += 1
+                expect_comma = False
+                continue
+
+            try:
+                claim, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as err:
+                # Only an error at the buffer edge can be a claim split across
+                # reads; anything earlier is bad JSON, whatever follows it
+                if eof or not _at_buffer_edge(err, buf):
+                    raise _decode_error(json_path, err, offset) from err
+                claim, end = None, None
+            # A decode that stops at the buffer edge may still be cut short too
+            if end is None or (end == len(buf) and not eof):
+                more = f.read(chunk_size)
+                eof = not more
+                offset += pos
+                buf = buf[pos:] + more
+                pos = 0
+                continue
+
+            yield claim, buf[pos:end]
+            pos = end
+            expect_comma = True
+
+
+def _at_buffer_edge(err, buf):
+    # An unterminated string ran into the end of the buffer, wherever it
+    # started; any other error there points at most a partial token
+    # (an escape, number or literal) before the end
+    return err.msg.startswith("Unterminated string") or err.pos >= len(buf) - _TOKEN_MARGIN
+
+
+def _decode_error(json_path, err, offset):
+    # err with its position in the file rather than in the read buffer
+    pos = offset + err.pos
+    line = 1
+    column = pos + 1
+    with open(json_path, "r", encoding="utf-8") as f:
+        read = 0
+        while read < pos:
+            text = f.read(min(READ_CHUNK, pos - read))
+            if not text:
+                break
+            newlines = text.count("\n")
+            if newlines:
+                line += newlines
+                column = pos - (read + text.rindex("\n"))
+            read += len(text)
+    return ValueError(f"Invalid JSON in {json_path}: {err.msg}: line {line} column {column} (char {pos})")
+
+
+def index_path(jsonl_path):
+    # claims.jsonl -> claims.jsonl.idx
+    jsonl_path = Path(jsonl_path)
+    return jsonl_path.with_name(jsonl_path.name + INDEX_SUFFIX)
+
+
+def encode_claim_line(claim):
+    # One claim as the minified UTF-8 JSON line a .jsonl claim file holds, newline excluded
+    return json.dumps(claim, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def tee_claims_jsonl(claims, f, index_f):
+    # Passes claims through while writing each as one line of minified JSON to
+    # the binary file f, and a [ClaimID, offset, length] line to index_f
+    write = _record_writer(f, index_f)
+    for claim in claims:
+        details = claim.get("ClaimDetails") if isinstance(claim, dict) else None
+        claim_id = details.get("ClaimID", "") if isinstance(details, dict) else ""
+        write(claim_id, encode_claim_line(claim))
+        yield claim
+
+
+def _record_writer(f, index_f):
+    offset = f.tell()
+
+    def write(claim_id, record):
+        nonlocal offset
+        f.write(record)
+        f.write(b"\n")
+        index_f.write(json.dumps([claim_id, offset, len(record)]))
+        index_f.write("\n")
+        offset += len(record) + 1
+    return write
+
+
+def write_claims_jsonl(claims, jsonl_path):
+    # Writes the claim file and its index side by side; returns the claim count
+    with open(jsonl_path, "wb") as f, open(index_path(jsonl_path), "w", encoding="utf-8") as index_f:
+        return sum(1 for _ in tee_claims_jsonl(claims, f, index_f))
+
+
+def write_encoded_jsonl(records, jsonl_path):
+    # write_claims_jsonl for claims already encoded: (ClaimID, encode_claim_line(claim)) pairs
+    with open(jsonl_path, "wb") as f, open(index_path(jsonl_path), "w", encoding="utf-8") as index_f:
+        write = _record_writer(f, index_f)
+        for claim_id, record in records:
+            write(claim_id, record)
+
+
+class ClaimFile:
+    # Reader for a .jsonl claim file. get() fetches one claim by ClaimID from a
+    # memory map, through the sidecar index, without touching the rest of the file,
+    # and byte_ranges()/iter_claims(start, end) let workers split the file
+    # between them: each range yields exactly the claims whose line starts in it.
+    def __init__(self, jsonl_path):
+        self.path = Path(jsonl_path)
+        self._file = open(self.path, "rb")
+        self.size = self.path.stat().st_size
+        # mmap refuses empty files
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self._index = None
+
+    def index(self):
+        # ClaimID -> (offset, length), loaded on first use
+        if self._index is None:
+            self._index = {}
+            with open(index_path(self.path), "r", encoding="utf-8") as f:
+                for line in f:
+                    claim_id, offset, length = json.loads(line)
+                    self._index.setdefault(claim_id, (offset, length))
+        return self._index
+
+    def get(self, claim_id):
+        entry = self.index().get(claim_id)
+        if entry is None:
+            raise KeyError(claim_id)
+        offset, length = entry
+        return json.loads(self._mm[offset:offset + length])
+
+    def __contains__(self, claim_id):
+        return claim_id in self.index()
+
+    def __len__(self):
+        return len(self.index())
+
+    def byte_ranges(self, parts):
+        # parts (start, end) ranges of roughly equal size covering the file
+        step = max(1, -(-self.size // max(1, parts)))
+        return [(start, min(start + step, self.size)) for start in range(0, self.size, step)]
+
+    def iter_claims(self, start=0, end=None):
+        for claim, _ in self.iter_records(start, end):
+            yield claim
+
+    def iter_records(self, start=0, end=None):
+        # (claim, line) pairs. Scans with buffered reads rather than the map, so
+        # walking a whole file doesn't leave every page of it resident
+        end = self.size if end is None else min(end, self.size)
+        with open(self.path, "rb", buffering=READ_CHUNK) as f:
+            pos = start
+            if pos > 0:
+                f.seek(pos - 1)
+                if f.read(1) != b"\n":
+                    # Mid-line: that claim belongs to the range before this one
+                    pos += len(f.readline())
+            while pos < end:
+                line = f.readline()
+                if not line:
+                    return
+                pos += len(line)
+                if line.strip():
+                    yield json.loads(line), line
+
+    def __iter__(self):
+        return self.iter_claims()
+
+    def close(self):
+        if self.size:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def iter_jsonl_claims(jsonl_path, start=0, end=None):
+    with ClaimFile(jsonl_path) as claim_file:
+        yield from claim_file.iter_claims(start, end)
+
+
+def iter_claim_records(claims_path):
+    # (claim, raw record) pairs from either format: the .jsonl line, or the
+    # claim's text in the JSON array. Equal records always decode to equal
+    # claims, so the record can stand in for the claim where only that matters.
+    if Path(claims_path).suffix.lower() == JSONL_SUFFIX:
+        with ClaimFile(claims_path) as claim_file:
+            yield from claim_file.iter_records()
+        return
+    yield from iter_json_records(claims_path)
+
+
+def iter_indexed_records(jsonl_path):
+    # (ClaimID, line) pairs of a .jsonl claim file, the ClaimID taken from the
+    # sidecar index so the line is never decoded. ClaimID is None wherever the
+    # index doesn't line up with the file (missing, or stale) and only
+    # decoding the line can tell.
+    index_f = None
+    try:
+        index_f = open(index_path(jsonl_path), "r", encoding="utf-8")
+    except FileNotFoundError:
+        pass
+    try:
+        with open(jsonl_path, "rb", buffering=READ_CHUNK) as f:
+            offset = 0
+            entries = iter(())
+            for line in f:
+                entry = next(entries, None)
+                if entry is None and index_f is not None:
+                    # Index lines are decoded INDEX_CHUNK at a time, as one array
+                    batch = list(itertools.islice(index_f, INDEX_CHUNK))
+                    if not batch:
+                        index_f.close()
+                        index_f = None
+                    entries = iter(json.loads("[" + ",".join(batch) + "]"))
+                    entry = next(entries, None)
+                claim_id = None
+                if entry is not None:
+                    entry_id, entry_offset, length = entry
+                    if entry_offset == offset and length == len(line.rstrip(b"\n")):
+                        claim_id = entry_id
+                offset += len(line)
+                if line.strip():
+                    yield claim_id, line
+    finally:
+        if index_f is not None:
+            index_f.close()
+
+
+def json_byte_ranges(json_path, parts):
+    # Splits a claims array written by json.dump(indent=4) or tee_claims_json
+    # into about parts (start, end) ranges, each starting on a claim. There
+    # every claim opens on a new line indented four spaces, and JSON strings
+    # never hold a raw newline, so that pattern marks claim starts and nothing
+    # else. Files laid out any other way come back as a single range.
+    size = Path(json_path).stat().st_size
+    with open(json_path, "rb") as f:
+        if f.read(len(_INDENTED_CLAIM) + 1) != b"[" + _INDENTED_CLAIM:
+            return [(0, size)]
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            step = max(1, -(-size // max(1, parts)))
+            starts = [0]
+            for target in range(step, size, step):
+                found = mm.find(_INDENTED_CLAIM, max(target, starts[-1] + 1))
+                if found == -1:
+                    break
+                starts.append(found + 1)
+        finally:
+            mm.close()
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _iter_json_range(json_path, start, end):
+    # The claims of one json_byte_ranges() range, which holds whole claims
+    # separated by commas, plus the array's brackets in the first and last range
+    with open(json_path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        pos = _SEPARATORS.match(text, pos).end()
+        if pos == len(text) or text[pos] == "]":
+            return
+        claim, pos = decoder.raw_decode(text, pos)
+        yield claim
+
+
+def claim_byte_ranges(claims_path, parts):
+    # (start, end) ranges of either intermediate format for iter_claims(path, start, end)
+    if Path(claims_path).suffix.lower() == JSONL_SUFFIX:
+        with ClaimFile(claims_path) as claim_file:
+            return claim_file.byte_ranges(parts)
+    return json_byte_ranges(claims_path, parts)
+
+
+def iter_claims(claims_path, start=0, end=None):
+    # Claims from either intermediate format, picked by file suffix. With a
+    # range from claim_byte_ranges(), only the claims starting in it.
+    if Path(claims_path).suffix.lower() == JSONL_SUFFIX:
+        return iter_jsonl_claims(claims_path, start, end)
+    if start == 0 and end is None:
+        return iter_json_claims(claims_path)
+    return _iter_json_range(claims_path, start, Path(claims_path).stat().st_size if end is None else end)
@@ -0,0 +1,146 @@
+import argparse
+import csv
+from contextlib import ExitStack
+from pathlib import Path
+
+from CSV_to_JSON import (
+    OUTPUT_FORMATS, SPILL_BYTES, ClaimsNotGroupedError, iter_grouped_claims, iter_external_claims, tee_claims_json
+)
+from claim_io import JSONL_SUFFIX, index_path, tee_claims_jsonl
+from generateDentalX12_Batch import write_dental_x12_batch
+from instrumentation import DEFAULT_METRICS_DIR, NULL_INSTRUMENTATION, get_instrumentation
+from x12_envelope import CONTROL_NUMBER_STATE, ControlNumberAllocator
+from x12_parallel import RANGE_BYTES, write_dental_x12_parallel
+from x12_writer import open_x12_output
+
+
+def run_pipeline(csv_path, x12_path="Output/.837D/Batch_837D.txt", json_folder=None,
+                 grouped=None, spill_bytes=SPILL_BYTES, workers=None, consolidate=False, instrumentation=None,
+                 json_format="json", range_bytes=RANGE_BYTES, state_path=None):
+    # CSV rows -> grouped claims -> 837D segments in one process, with no JSON
+    # round trip. Pass json_folder to also write the nested JSON as a side output,
+    # json_format="jsonl" for the compact, indexed claim file instead.
+    # grouped=None tries the streaming path and falls back to external grouping,
+    # True insists the CSV is grouped by ClaimID, False goes straight to external.
+    # workers renders in a process pool (see write_dental_x12_parallel): the
+    # claims are written to the JSON side output first, or to a temporary .jsonl
+    # next to x12_path without one, and each worker parses its own byte range.
+    # consolidate shares HL loops between claims (see write_dental_x12_batch).
+    # instrumentation collects per-stage timings and counters (see instrumentation.py).
+    # With state_path control numbers carry on from the last run (the CLI's --state).
+    csv_path = Path(csv_path)
+    x12_path = Path(x12_path)
+    x12_path.parent.mkdir(parents=True, exist_ok=True)
+
+    json_path = None
+    if json_folder is not None:
+        json_path = Path(json_folder) / (csv_path.stem + "." + json_format)
+        json_path.parent.mkdir(parents=True, exist_ok=True)
+
+    if workers and consolidate:
+        raise ValueError("consolidate is not supported together with workers")
+    allocator = ControlNumberAllocator(state_path=state_path)
+    write_x12 = lambda claims, out: write_dental_x12_batch(claims, out, allocator=allocator, consolidate=consolidate)
+    claims_path = json_path
+    if workers:
+        write_x12 = None
+        claims_path = json_path or x12_path.with_name(x12_path.stem + ".claims" + JSONL_SUFFIX)
+
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    try:
+        writer = _group(csv_path, x12_path, claims_path, grouped, spill_bytes, write_x12, instrumentation,
+                        allocator)
+        if workers:
+            with open_x12_output(x12_path) as out, instrumentation.span("render"):
+                writer = write_dental_x12_parallel(claims_path, instrumentation.file(out), workers=workers,
+                                                   allocator=allocator, range_bytes=range_bytes)
+            instrumentation.count("segments", writer.segment_count)
+        allocator.save()
+    finally:
+        if claims_path is not None and claims_path != json_path:
+            claims_path.unlink(missing_ok=True)
+            index_path(claims_path).unlink(missing_ok=True)
+
+    print(f"X12 batch file written: {x12_path}")
+    if json_path is not None:
+        print(f"Nested JSON created at: {json_path}")
+    return writer
+
+
+def _group(csv_path, x12_path, json_path, grouped, spill_bytes, write_x12, instrumentation, allocator):
+    if grouped is not False:
+        # The aborted attempt's batch is thrown away, so are the numbers it took
+        numbers = allocator.snapshot()
+        try:
+            return _run(csv_path, x12_path, json_path, iter_grouped_claims, write_x12, instrumentation)
+        except ClaimsNotGroupedError as e:
+            if grouped:
+                raise
+            print(f"{e}; falling back to external grouping")
+            allocator.restore(numbers)
+            instrumentation.discard("rows", "claims", "lines", "bytes_written")
+            instrumentation.count("grouping_restarts")
+
+    external = lambda rows: iter_external_claims(rows, spill_bytes, tmp_dir=x12_path.parent)
+    return _run(csv_path, x12_path, json_path, external, write_x12, instrumentation)
+
+
+def _run(csv_path, x12_path, json_path, group_claims, write_x12, instrumentation):
+    # Without write_x12 the claims only go to json_path, for the workers to render from
+    with ExitStack() as stack:
+        f = stack.enter_context(csv_path.open("r", encoding="utf-8"))
+        rows = instrumentation.wrap("csv_read", csv.DictReader(f), "rows")
+        claims = instrumentation.claims("grouping", group_claims(rows))
+        if json_path is not None:
+            if json_path.suffix == JSONL_SUFFIX:
+                json_file = stack.enter_context(json_path.open("wb"))
+                index_file = stack.enter_context(index_path(json_path).open("w", encoding="utf-8"))
+                claims = tee_claims_jsonl(claims, json_file, index_file)
+            else:
+                json_file = stack.enter_context(json_path.open("w", encoding="utf-8"))
+                claims = tee_claims_json(claims, json_file)
+            claims = instrumentation.wrap("json_write", claims)
+        if write_x12 is None:
+            for _ in claims:
+                pass
+            return None
+        out = stack.enter_context(open_x12_output(x12_path))
+        with instrumentation.span("render"):
+            writer = write_x12(claims, instrumentation.file(out))
+        instrumentation.count("segments", writer.segment_count)
+    return writer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a claims CSV export straight to an 837D batch file.")
+    parser.add_argument("csv_path", help="CSV export with one procedure line per row")
+    parser.add_argument("--x12", default="Output/.837D/Batch_837D.txt", help="837D output path")
+    parser.add_argument("--json-folder", help="also write the nested claim JSON to this folder")
+    parser.add_argument("--json-format", choices=OUTPUT_FORMATS, default="json",
+                        help="indent=4 JSON array, or compact JSON lines with a ClaimID index")
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument("--grouped", dest="grouped", action="store_true", default=None,
+                       help="fail if rows are not grouped by ClaimID")
+    order.add_argument("--unsorted", dest="grouped", action="store_false",
+                       help="skip the streaming attempt and group rows on disk")
+    parser.add_argument("--workers", type=int, help="render claims in this many worker processes")
+    parser.add_argument("--consolidate", action="store_true",
+                        help="one 2000A loop per billing provider and one 2000B loop per subscriber")
+    parser.add_argument("--state", default=CONTROL_NUMBER_STATE,
+                        help="where the last control numbers used are kept between runs")
+    parser.add_argument("--metrics-dir", nargs="?", const=DEFAULT_METRICS_DIR,
+                        help=f"write a run report and Prometheus textfile here (default {DEFAULT_METRICS_DIR})")
+    parser.add_argument("--profile", action="store_true", help="run under cProfile and dump the stats with the metrics")
+    args = parser.parse_args(argv)
+    if args.workers and args.consolidate:
+        parser.error("--consolidate cannot be combined with --workers")
+
+    instrumentation = get_instrumentation(args.metrics_dir is not None, args.profile)
+    run_pipeline(args.csv_path, args.x12, args.json_folder, args.grouped, workers=args.workers,
+                 consolidate=args.consolidate, instrumentation=instrumentation, json_format=args.json_format,
+                 state_path=args.state)
+    instrumentation.write_reports(args.metrics_dir or DEFAULT_METRICS_DIR)
+
+
+if __name__ == "__main__":
+    main()
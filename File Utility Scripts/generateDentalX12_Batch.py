@@ -1,15 +1,30 @@
 import json
 from datetime import datetime
+from itertools import islice
 from pathlib import Path
-from io import StringIO
-from pyx12.x12file import X12Reader
-from pyx12.errors import X12Error
+from claim_io import JSONL_SUFFIX, index_path, iter_claim_records, iter_claims, iter_indexed_records
+from instrumentation import NULL_INSTRUMENTATION
+from x12_envelope import (
+    MAX_CLAIMS_PER_TRANSACTION, ControlNumberAllocator, isa_segment, gs_segment, st_segment
+)
+from x12_templates import (
+    render_billing_provider, render_claim_body, render_claim_header, render_claim_loops, render_subscriber,
+    render_transaction_header
+)
+from x12_index import BatchIndexWriter
+from x12_writer import COMPRESSION_SUFFIXES, SegmentWriter, WRITE_BUFFER, byte_length, open_x12_output
+
+# What the writers read from a claim around its block, by the block's renderer:
+# all a claim the cache matched without decoding needs to keep (see
+# ClaimBlockCache.read_indexed). The keys are for index_claims and the batch index.
+_KEY_FIELDS = ("ClaimDetails.ClaimID", "Payer.PayerID", "BillingProvider.NPI", "Subscriber.SubscriberID")
+CLAIM_FIELDS = {
+    render_claim_loops.__name__: tuple(dict.fromkeys(render_claim_header.fields + _KEY_FIELDS)),
+    render_claim_body.__name__: tuple(dict.fromkeys(
+        render_transaction_header.fields + render_billing_provider.fields + render_subscriber.fields + _KEY_FIELDS
+    )),
+}
 
-def format_x12_date(date_str):
-    try:
-        return datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y%m%d")
-    except:
-        return ""
 
 def get_field(data, *keys, default=""):
     d = data
@@ -20,93 +35,308 @@ def get_field(data, *keys, default=""):
             return default
     return d
 
-def generate_dental_x12_batch(json_file_path):
-    with open(json_file_path, 'r', encoding='utf-8') as f:
-        claims = json.load(f)
+def generate_dental_x12_batch(json_file_path, consolidate=False, cache=None, instrumentation=None,
+                              max_bytes=None, max_claims=None, compression=None, state_path=None):
+    # With max_bytes, max_claims or compression the batch is split across
+    # Batch_837D_0001.txt... (see write_rotating_batches) and the manifest path
+    # is returned instead of the single file's. With state_path (run_x12 uses
+    # CONTROL_NUMBER_STATE) control numbers carry on from the last run;
+    # without it they start at 1.
+    instrumentation = instrumentation or NULL_INSTRUMENTATION
+    allocator = ControlNumberAllocator(state_path=state_path)
+    # Write file
+    output_dir = Path("Output/.837D")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if max_bytes or max_claims or compression:
+        claims = instrumentation.claims("json_read", _read_claims(json_file_path, cache, consolidate))
+        with instrumentation.span("render"):
+            manifest = write_rotating_batches(claims, output_dir, max_bytes, max_claims, compression, consolidate,
+                                              cache, allocator, instrumentation=instrumentation)
+        allocator.save()
+        instrumentation.count("segments", sum(entry["segments"] for entry in manifest["files"]))
+        instrumentation.count("files_written", len(manifest["files"]))
+        manifest_path = output_dir / "Batch_837D_manifest.json"
+        print(f"X12 batch written as {len(manifest['files'])} files, listed in: {manifest_path}")
+        return manifest_path
+    file_path = output_dir / "Batch_837D.txt"
+    # newline="" keeps the index's byte offsets exact on Windows too
+    with open(file_path, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER) as f, \
+            open(index_path(file_path), "w", encoding="utf-8") as index_f:
+        claims = instrumentation.claims("json_read", _read_claims(json_file_path, cache, consolidate))
+        batch_index = BatchIndexWriter(index_f)
+        with instrumentation.span("render"):
+            out = write_dental_x12_batch(claims, instrumentation.file(f), allocator=allocator, consolidate=consolidate,
+                                         cache=cache, batch_index=batch_index)
+        batch_index.finish(out.offset)
+        instrumentation.count("segments", out.segment_count)
+    allocator.save()
+    print(f"X12 batch file written: {file_path}")
+    return file_path
 
-    now = datetime.now()
+
+def _read_claims(json_file_path, cache, consolidate):
+    # With a cache, claims come with their raw records, which it hashes instead
+    # of the claims. A .jsonl file's lines are matched through its index, so
+    # only new or changed claims are decoded at all.
+    if cache is None:
+        return iter_claims(json_file_path)
+    if Path(json_file_path).suffix.lower() == JSONL_SUFFIX:
+        kind = (render_claim_body if consolidate else render_claim_loops).__name__
+        return cache.read_indexed(iter_indexed_records(json_file_path), kind, CLAIM_FIELDS[kind])
+    return cache.read(iter_claim_records(json_file_path))
+
+
+def write_dental_x12_batch(claims, f, now=None, allocator=None, consolidate=False, cache=None, batch_index=None):
+    # Streams one interchange to f; claims can be any iterable, so segments
+    # reach the file before the last claim has been parsed. With consolidate,
+    # claims sharing a billing provider and subscriber share their HL loops
+    # instead (see write_consolidated_transactions). With a ClaimBlockCache,
+    # unchanged claims reuse the segments rendered for them on an earlier run.
+    # With a BatchIndexWriter, where each claim lands is recorded as it is written.
+    now = now or datetime.now()
     date = now.strftime("%y%m%d")
     time = now.strftime("%H%M")
     full_date = now.strftime("%Y%m%d")
-    control_number = "000000001"
+    # A fresh allocator starts at 1; pass one built with state_path to carry on from the last run
+    allocator = allocator or ControlNumberAllocator()
+    control_number = allocator.next_interchange()
+    group_number = allocator.next_group()
 
-    x12_output = []
+    out = SegmentWriter(f)
 
     # ISA / GS
-    x12_output.append(f"ISA*00*{'':10}*00*{'':10}*ZZ*SENDERID       *ZZ*RECEIVERID     *{date}*{time}*^*00501*{control_number}*1*T*:~")
-    x12_output.append(f"GS*HC*SENDERID*RECEIVERID*{full_date}*{time}*{control_number}*X*005010X224A2~")
+    out.start_interchange(isa_segment(control_number, date, time))
+    out.start_group(gs_segment(group_number, full_date, time))
+
+    if consolidate:
+        write_consolidated_transactions(index_claims(claims), out, allocator, control_number, full_date, time, cache,
+                                        batch_index)
+    else:
+        # One ST/SE per claim, each with its own BHT and HL 1/2
+        header_env = {"full_date": full_date, "time": time}
+        for claim, block, count in iter_claim_blocks(claims, render_claim_loops, cache):
+            write_claim_transaction(out, claim, block, count, allocator.next_transaction(), header_env,
+                                    batch_index)
+
+    # GE / IEA
+    out.write(f"GE*{out.transaction_sets}*{group_number}~")
+    out.write(f"IEA*{out.groups}*{control_number}~")
+    return out
+
+
+def write_claim_transaction(out, claim, block, count, st_number, header_env, batch_index=None):
+    # ST, the claim's BHT header and loops, SE. The index range covers BHT
+    # through the last loop segment, without the envelope
+    out.start_transaction(st_segment(st_number))
+    header = render_claim_header(claim, header_env)
+    out.write_block("\n".join(header), len(header))
+    start, first_line = out.last_start, out.last_line
+    out.write_block(block, count)
+    if batch_index is not None:
+        batch_index.add(claim, start, out.offset, first_line, out.segment_count)
+    out.write(f"SE*{out.transaction_segment_count()}*{st_number}~")
 
-    # Single ST for all claims
-    st_number = "0001"
-    x12_output.append(f"ST*837*{st_number}*005010X224A2~")
-    st_start_index = len(x12_output)
 
+def iter_claim_blocks(claims, render, cache=None):
+    # (claim, joined segments, segment count) for each claim, from the cache when one is given
+    if cache is not None:
+        yield from cache.iter_blocks(claims, render, render.__name__, CLAIM_FIELDS.get(render.__name__, ()))
+        return
     for claim in claims:
-        # BHT
-        x12_output.append(f"BHT*0019*00*{get_field(claim, 'ClaimDetails', 'ClaimID')}*{full_date}*{time}*CH~")
-        x12_output.append("NM1*41*2*Organization Name*****46*WTPID000007~")
-        x12_output.append("PER*IC*Help Desk*TE*18005551234~")
-        x12_output.append(f"NM1*40*2*{get_field(claim, 'Payer', 'Name')}*****46*{get_field(claim, 'Payer', 'PayerID')}~")
-
-        # Billing Provider
-        x12_output.append("HL*1**20*1~")
-        x12_output.append(f"NM1*85*2*{get_field(claim, 'BillingProvider', 'ProviderName')}*****XX*{get_field(claim, 'BillingProvider', 'NPI')}~")
-        addr2 = get_field(claim, 'BillingProvider', 'Address2')
-        if addr2:
-            x12_output.append(f"N3*{get_field(claim, 'BillingProvider', 'Address')}*{addr2}~")
-        else:
-            x12_output.append(f"N3*{get_field(claim, 'BillingProvider', 'Address')}~")
-        x12_output.append(f"N4*{get_field(claim, 'BillingProvider', 'City')}*{get_field(claim, 'BillingProvider', 'State')}*{get_field(claim, 'BillingProvider', 'Zip')}~")
-        x12_output.append(f"REF*EI*{get_field(claim, 'BillingProvider', 'TaxID')}~")
-
-        # Subscriber
-        x12_output.append("HL*2*1*22*0~")
-        x12_output.append("SBR*S*18******MA~")
-        x12_output.append(f"NM1*IL*1*{get_field(claim, 'Subscriber', 'LastName')}*{get_field(claim, 'Subscriber', 'FirstName')}*{get_field(claim, 'Subscriber', 'Middle')}**MI*{get_field(claim, 'Subscriber', 'SubscriberID')}~")
-        addr2 = get_field(claim, 'Subscriber', 'Address2')
-        if addr2:
-            x12_output.append(f"N3*{get_field(claim, 'Subscriber', 'Address')}*{addr2}~")
-        else:
-            x12_output.append(f"N3*{get_field(claim, 'Subscriber', 'Address')}~")
-        x12_output.append(f"N4*{get_field(claim, 'Subscriber', 'City')}*{get_field(claim, 'Subscriber', 'State')}*{get_field(claim, 'Subscriber', 'Zip')}~")
-        x12_output.append(f"DMG*D8*{format_x12_date(get_field(claim, 'Subscriber', 'DOB'))}*{get_field(claim, 'Subscriber', 'Gender')}~")
-        x12_output.append(f"NM1*PR*2*{get_field(claim, 'Payer', 'Name')}*****PI*{get_field(claim, 'Payer', 'PayerID')}~")
-
-        # Claim info
-        facility_code = get_field(claim, 'ClaimDetails', 'FacilityCode') or 'B'
-        treatment_code = get_field(claim, 'ClaimDetails', 'TreatmentResultingCode') or 'B'
-        x12_output.append(f"CLM*{get_field(claim, 'ClaimDetails', 'ClaimID')}*{get_field(claim, 'ClaimDetails', 'ClaimAmount')}***{get_field(claim, 'ClaimDetails', 'PlaceOfService')}:{facility_code}:1*Y*A*Y*Y*{treatment_code}~")
-
-        # Rendering provider
-        x12_output.append(f"NM1*82*1*{get_field(claim, 'RenderingProvider', 'LastName')}*{get_field(claim, 'RenderingProvider', 'FirstName')}*{get_field(claim, 'RenderingProvider', 'Middle')}**XX*{get_field(claim, 'RenderingProvider', 'NPI')}~")
-        x12_output.append(f"PRV*PE*PXC*{get_field(claim, 'BillingProvider', 'Taxonomy')}~")
-
-        # Procedure lines
-        lx_counter = 1
-        for line in get_field(claim, 'ProcedureLines', default=[]):
-            x12_output.append(f"LX*{lx_counter}~")
-            x12_output.append(f"SV3*AD:{get_field(line,'ProcedureCode')}*{get_field(line,'Fee')}**{get_field(line,'AreaOfOralCavity')}*{get_field(line,'ReplacementIndicator')}*{get_field(line,'Quantity')}*~")
-            x12_output.append(f"DTP*472*D8*{format_x12_date(get_field(line, 'ProcedureDate'))}~")
-            tooth_num = get_field(line, 'ToothNumber','')
-            tooth_surf = get_field(line, 'ToothSurfaceCode','')
-            tooth_system = get_field(line,'ToothSystem','JP')
-            if tooth_num or tooth_surf:
-                x12_output.append(f"TOO*{tooth_system}*{tooth_num}*{tooth_surf}~")
-            lx_counter += 1
-
-    # Single SE for all claims
-    segment_count = len(x12_output) - st_start_index + 1  # include ST itself
-    x12_output.append(f"SE*{segment_count}*{st_number}~")
+        segments = render(claim)
+        yield claim, "\n".join(segments), len(segments)
 
-    # GE / IEA
-    x12_output.append(f"GE*1*{control_number}~")
-    x12_output.append(f"IEA*1*{control_number}~")
 
-    # Write file
-    output_dir = Path("Output/.837D")
+def index_claims(claims):
+    # PayerID -> billing NPI -> SubscriberID -> [claims], each level in first-seen order
+    index = {}
+    for claim in claims:
+        providers = index.setdefault(get_field(claim, 'Payer', 'PayerID'), {})
+        subscribers = providers.setdefault(get_field(claim, 'BillingProvider', 'NPI'), {})
+        subscribers.setdefault(get_field(claim, 'Subscriber', 'SubscriberID'), []).append(claim)
+    return index
+
+
+def write_consolidated_transactions(index, out, allocator, control_number, full_date, time, cache=None,
+                                    batch_index=None):
+    # One ST/SE per payer (the receiver), holding one 2000A loop per billing
+    # provider and one 2000B loop per subscriber under it, with the claims nested
+    # inside. A payer with more claims than one transaction set may hold is
+    # continued in a new ST, re-opening the provider and subscriber loops there.
+    # The index gets each claim's own segments plus the byte ranges of the
+    # shared loops above it, which an extract needs to stand the claim alone
+    def write(segments):
+        out.write_block("\n".join(segments), len(segments))
+        return out.last_start, out.offset
+
+    # Claim bodies come out of this in exactly the order the loops below visit them
+    ordered = (
+        claim for providers in index.values()
+        for subscribers in providers.values()
+        for subscriber_claims in subscribers.values()
+        for claim in subscriber_claims
+    )
+    bodies = iter_claim_blocks(ordered, render_claim_body, cache)
+
+    for providers in index.values():
+        st_number = None
+        for subscribers in providers.values():
+            provider_hl = None
+            for subscriber_claims in subscribers.values():
+                subscriber_hl = None
+                for claim in subscriber_claims:
+                    if st_number is None or claim_count == MAX_CLAIMS_PER_TRANSACTION:
+                        if st_number is not None:
+                            out.write(f"SE*{out.transaction_segment_count()}*{st_number}~")
+                        st_number = allocator.next_transaction()
+                        out.start_transaction(st_segment(st_number))
+                        env = {"reference": control_number + st_number, "full_date": full_date, "time": time}
+                        header_range = write(render_transaction_header(claim, env))
+                        hl_id = 0
+                        claim_count = 0
+                        provider_hl = subscriber_hl = None
+
+                    if provider_hl is None:
+                        hl_id += 1
+                        provider_hl = hl_id
+                        env = {"hl_id": provider_hl, "hl_parent": ""}
+                        provider_range = write(render_billing_provider(claim, env))
+                    if subscriber_hl is None:
+                        hl_id += 1
+                        subscriber_hl = hl_id
+                        env = {"hl_id": subscriber_hl, "hl_parent": provider_hl}
+                        subscriber_range = write(render_subscriber(claim, env))
+
+                    _, block, count = next(bodies)
+                    out.write_block(block, count)
+                    if batch_index is not None:
+                        batch_index.add(claim, out.last_start, out.offset, out.last_line, out.segment_count,
+                                        (header_range, provider_range, subscriber_range))
+                    claim_count += 1
+
+        if st_number is not None:
+            out.write(f"SE*{out.transaction_segment_count()}*{st_number}~")
+
+
+class _RotatedFile:
+    # One file of a rotated batch: its handle, its claim index (uncompressed
+    # files only, since index offsets are into the plain text) and its envelope
+    def __init__(self, path, compression, allocator, now, instrumentation=NULL_INSTRUMENTATION):
+        self.path = path
+        self.f = open_x12_output(path, compression)
+        self.index_f = open(index_path(path), "w", encoding="utf-8") if compression is None else None
+        self.batch_index = BatchIndexWriter(self.index_f) if self.index_f else None
+        self.out = SegmentWriter(instrumentation.file(self.f))
+        self.claims = 0
+        self.control_number = allocator.next_interchange()
+        self.group_number = allocator.next_group()
+        self.out.start_interchange(isa_segment(self.control_number, now.strftime("%y%m%d"), now.strftime("%H%M")))
+        self.out.start_group(gs_segment(self.group_number, now.strftime("%Y%m%d"), now.strftime("%H%M")))
+
+    def size_with(self, header, block, count, st_number):
+        # Bytes the file will hold once one more claim's ST..SE and the GE/IEA trailers are written
+        out = self.out
+        parts = (st_segment(st_number), "\n".join(header), block, f"SE*{len(header) + count + 2}*{st_number}~",
+                 f"GE*{out.transaction_sets + 1}*{self.group_number}~", f"IEA*{out.groups}*{self.control_number}~")
+        return out.offset + sum(len(out.separator) + byte_length(part) for part in parts)
+
+    def close(self):
+        out = self.out
+        out.write(f"GE*{out.transaction_sets}*{self.group_number}~")
+        out.write(f"IEA*{out.groups}*{self.control_number}~")
+        self.f.close()
+        if self.batch_index is not None:
+            self.batch_index.finish(out.offset)
+            self.index_f.close()
+        return {
+            "file": self.path.name,
+            "interchange_control_number": self.control_number,
+            "group_control_number": self.group_number,
+            "transaction_sets": out.transaction_sets,
+            "claims": self.claims,
+            "segments": out.segment_count,
+            "bytes": out.offset,
+            "stored_bytes": self.path.stat().st_size,
+        }
+
+
+def write_rotating_batches(claims, output_dir="Output/.837D", max_bytes=None, max_claims=None, compression=None,
+                           consolidate=False, cache=None, allocator=None, now=None, name="Batch_837D",
+                           instrumentation=NULL_INSTRUMENTATION):
+    # Writes claims across as many interchanges as the limits need, each a
+    # complete ISA..IEA file (<name>_0001.txt, _0002.txt, ...) with the next
+    # control numbers. A file is closed before the claim that would take it
+    # past max_claims claims or max_bytes bytes (uncompressed, trailers
+    # included); a single claim bigger than max_bytes still gets a file of its
+    # own. The per-claim layout can be split on either limit. Consolidated
+    # batches group claims before writing any, so they only rotate on max_claims.
+    # Writes are charged to instrumentation's file_write stage, uncompressed.
+    # Returns the manifest, also written to <name>_manifest.json.
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression} (use gzip or zstd)")
+    if consolidate and max_bytes:
+        raise ValueError("max_bytes needs the per-claim layout; split consolidated batches with max_claims")
+    output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
-    file_path = output_dir / "Batch_837D.txt"
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write("\n".join(x12_output))
-    print(f"X12 batch file written: {file_path}")
+    allocator = allocator or ControlNumberAllocator()
+    now = now or datetime.now()
+    files = []
+
+    def open_file():
+        path = output_dir / f"{name}_{len(files) + 1:04d}.txt{COMPRESSION_SUFFIXES[compression]}"
+        return _RotatedFile(path, compression, allocator, now, instrumentation)
+
+    if consolidate:
+        _write_consolidated(claims, open_file, files, max_claims, cache, allocator, now)
+    else:
+        _write_per_claim(claims, open_file, files, max_bytes, max_claims, cache, allocator, now)
+
+    manifest = {
+        "created": now.isoformat(timespec="seconds"),
+        "compression": compression,
+        "max_bytes": max_bytes,
+        "max_claims": max_claims,
+        "claims": sum(entry["claims"] for entry in files),
+        "files": files,
+    }
+    manifest_path = output_dir / f"{name}_manifest.json"
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(manifest, indent=4) + "\n", encoding="utf-8")
+    tmp_path.replace(manifest_path)
+    return manifest
+
+
+def _write_per_claim(claims, open_file, files, max_bytes, max_claims, cache, allocator, now):
+    header_env = {"full_date": now.strftime("%Y%m%d"), "time": now.strftime("%H%M")}
+    current = None
+    for claim, block, count in iter_claim_blocks(claims, render_claim_loops, cache):
+        st_number = allocator.next_transaction()
+        if current is not None and current.claims:
+            full = max_claims and current.claims >= max_claims
+            if not full and max_bytes:
+                header = render_claim_header(claim, header_env)
+                full = current.size_with(header, block, count, st_number) > max_bytes
+            if full:
+                files.append(current.close())
+                current = None
+        if current is None:
+            current = open_file()
+
+        write_claim_transaction(current.out, claim, block, count, st_number, header_env, current.batch_index)
+        current.claims += 1
+
+    if current is not None:
+        files.append(current.close())
+
 
+def _write_consolidated(claims, open_file, files, max_claims, cache, allocator, now):
+    claims = iter(claims)
+    while True:
+        chunk = list(islice(claims, max_claims)) if max_claims else list(claims)
+        if not chunk:
+            return
+        current = open_file()
+        write_consolidated_transactions(index_claims(chunk), current.out, allocator, current.control_number,
+                                        now.strftime("%Y%m%d"), now.strftime("%H%M"), cache, current.batch_index)
+        current.claims = len(chunk)
+        files.append(current.close())
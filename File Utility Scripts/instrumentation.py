@@ -0,0 +1,227 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+from pathlib import Path
+
+from CSV_to_JSON import peak_memory_mb
+from x12_writer import byte_length
+
+DEFAULT_METRICS_DIR = "Output/Metrics"
+REPORT_NAME = "run_report.jsonl"
+PROMETHEUS_NAME = "x12_pipeline.prom"
+PROFILE_NAME = "profile.pstats"
+
+
+class Instrumentation:
+    # Per-stage timings, counters and peak memory for one pipeline run.
+    #
+    # The pipeline is lazy (CSV rows, grouping, JSON writing and rendering all
+    # interleave claim by claim), so time is charged to whichever stage is
+    # running at the moment, not to nested wall-clock spans: entering a stage
+    # pauses the one that called it. Stage seconds therefore add up to the run
+    # time instead of double counting.
+    def __init__(self, profile=False):
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = datetime.now(timezone.utc)
+        self.stage_seconds = defaultdict(float)
+        self.counters = defaultdict(int)
+        self._stage = "other"
+        self._last = self._start = time.perf_counter()
+        self._profiler = cProfile.Profile() if profile else None
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    def _switch(self, stage):
+        now = time.perf_counter()
+        self.stage_seconds[self._stage] += now - self._last
+        self._last = now
+        previous, self._stage = self._stage, stage
+        return previous
+
+    @contextmanager
+    def span(self, stage):
+        previous = self._switch(stage)
+        try:
+            yield
+        finally:
+            self._switch(previous)
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def discard(self, *names):
+        # Forget counters from work that is about to be redone
+        for name in names:
+            self.counters.pop(name, None)
+
+    def wrap(self, stage, iterable, counter=None):
+        # Passes items through, charging the time spent producing each one to stage
+        iterator = iter(iterable)
+        switch = self._switch
+        while True:
+            previous = switch(stage)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                switch(previous)
+            if counter:
+                self.counters[counter] += 1
+            yield item
+
+    def claims(self, stage, claims):
+        # wrap() for claim dicts, also counting their procedure lines
+        for claim in self.wrap(stage, claims, "claims"):
+            lines = claim.get("ProcedureLines") if isinstance(claim, dict) else None
+            self.counters["lines"] += len(lines or ())
+            yield claim
+
+    def file(self, f, stage="file_write"):
+        return _InstrumentedFile(f, self, stage)
+
+    def finish(self):
+        # Stops the clock (and the profiler) and returns the run summary
+        self._switch(self._stage)
+        if self._profiler is not None:
+            self._profiler.disable()
+        seconds = time.perf_counter() - self._start
+        return {
+            "run_id": self.run_id,
+            "started": self.started.isoformat(),
+            "seconds": round(seconds, 6),
+            "peak_memory_mb": peak_memory_mb(),
+            "stages": {stage: round(s, 6) for stage, s in self.stage_seconds.items()},
+            "counters": dict(self.counters),
+        }
+
+    def write_reports(self, metrics_dir=DEFAULT_METRICS_DIR):
+        # Appends this run to the JSON-lines report, replaces the Prometheus
+        # textfile, and dumps the profile when profiling was on
+        summary = self.finish()
+        metrics_dir = Path(metrics_dir)
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+
+        report_path = metrics_dir / REPORT_NAME
+        with report_path.open("a", encoding="utf-8") as f:
+            for stage, seconds in summary["stages"].items():
+                f.write(json.dumps({"run_id": self.run_id, "event": "stage", "stage": stage, "seconds": seconds}) + "\n")
+            for name, value in summary["counters"].items():
+                f.write(json.dumps({"run_id": self.run_id, "event": "counter", "name": name, "value": value}) + "\n")
+            f.write(json.dumps(dict(summary, event="run")) + "\n")
+
+        write_prometheus_textfile(summary, metrics_dir / PROMETHEUS_NAME)
+
+        if self._profiler is not None:
+            profile_path = metrics_dir / PROFILE_NAME
+            self._profiler.dump_stats(profile_path)
+            out = io.StringIO()
+            pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(20)
+            print(out.getvalue())
+            print(f"Profile written to: {profile_path}")
+
+        print(f"Run report appended to: {report_path}")
+        return summary
+
+
+class NullInstrumentation:
+    # Stand-in used when instrumentation is off: every hook hands its argument
+    # straight back, so the pipeline pays one attribute lookup per stage
+    def span(self, stage):
+        return nullcontext()
+
+    def count(self, name, n=1):
+        pass
+
+    def discard(self, *names):
+        pass
+
+    def wrap(self, stage, iterable, counter=None):
+        return iterable
+
+    def claims(self, stage, claims):
+        return claims
+
+    def file(self, f, stage="file_write"):
+        return f
+
+    def finish(self):
+        return None
+
+    def write_reports(self, metrics_dir=DEFAULT_METRICS_DIR):
+        return None
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class _InstrumentedFile:
+    # File wrapper charging write() time to a stage and counting the UTF-8
+    # bytes written; names and addresses in the output need not be ASCII.
+    def __init__(self, f, instrumentation, stage):
+        self._f = f
+        self._instrumentation = instrumentation
+        self._stage = stage
+
+    def write(self, text):
+        instrumentation = self._instrumentation
+        previous = instrumentation._switch(self._stage)
+        try:
+            return self._f.write(text)
+        finally:
+            instrumentation._switch(previous)
+            instrumentation.counters["bytes_written"] += byte_length(text)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def write_prometheus_textfile(summary, path):
+    # node_exporter's textfile collector reads *.prom files; write to a temp
+    # file and rename so it never scrapes a half-written one
+    lines = [
+        "# HELP x12_pipeline_stage_seconds Seconds spent in each stage of the last run.",
+        "# TYPE x12_pipeline_stage_seconds gauge",
+    ]
+    for stage, seconds in sorted(summary["stages"].items()):
+        lines.append(f'x12_pipeline_stage_seconds{{stage="{stage}"}} {seconds}')
+    lines += [
+        "# HELP x12_pipeline_items Items processed by the last run.",
+        "# TYPE x12_pipeline_items gauge",
+    ]
+    for name, value in sorted(summary["counters"].items()):
+        lines.append(f'x12_pipeline_items{{kind="{name}"}} {value}')
+    lines += [
+        "# HELP x12_pipeline_run_seconds Wall time of the last run.",
+        "# TYPE x12_pipeline_run_seconds gauge",
+        f"x12_pipeline_run_seconds {summary['seconds']}",
+        "# HELP x12_pipeline_last_run_timestamp_seconds Unix time the last run started.",
+        "# TYPE x12_pipeline_last_run_timestamp_seconds gauge",
+        f"x12_pipeline_last_run_timestamp_seconds {datetime.fromisoformat(summary['started']).timestamp():.0f}",
+    ]
+    if summary["peak_memory_mb"] is not None:
+        lines += [
+            "# HELP x12_pipeline_peak_memory_bytes Peak resident set size of the last run.",
+            "# TYPE x12_pipeline_peak_memory_bytes gauge",
+            f"x12_pipeline_peak_memory_bytes {int(summary['peak_memory_mb'] * 1024 * 1024)}",
+        ]
+
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    os.replace(tmp_path, path)
+    return path
+
+
+def get_instrumentation(enabled=False, profile=False):
+    # A live Instrumentation when asked for one, otherwise the shared no-op
+    if enabled or profile:
+        return Instrumentation(profile=profile)
+    return NULL_INSTRUMENTATION
@@ -0,0 +1,140 @@
+import io
+import queue
+import tarfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Files handed to a sink but not yet on disk; producers block once this many are queued
+MAX_PENDING_FILES = 256
+
+
+class DirectorySink:
+    # Writes each file into a directory from a bounded thread pool, so the
+    # caller only ever waits on disk when MAX_PENDING_FILES are already queued
+    def __init__(self, directory, workers=4, max_pending=MAX_PENDING_FILES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="x12-writer")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._error = None
+        self.files_written = 0
+
+    def write(self, name, text):
+        if self._error:
+            raise self._error
+        self._slots.acquire()
+        future = self._pool.submit(self._write, self.directory / name, text)
+        future.add_done_callback(self._done)
+
+    def _write(self, path, text):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _done(self, future):
+        self._slots.release()
+        with self._lock:
+            if future.exception() is not None:
+                self._error = self._error or future.exception()
+            else:
+                self.files_written += 1
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        if self._error:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True)
+
+
+class ArchiveSink:
+    # Streams every file into one .zip, .tar, .tar.gz or .tgz archive. Archive
+    # writers aren't thread-safe, so a single background thread owns it and
+    # the caller hands files over through a bounded queue.
+    def __init__(self, archive_path, max_pending=MAX_PENDING_FILES):
+        self.archive_path = Path(archive_path)
+        self.archive_path.parent.mkdir(parents=True, exist_ok=True)
+        self._open_archive()
+        self._queue = queue.Queue(max_pending)
+        self._error = None
+        self.files_written = 0
+        self._thread = threading.Thread(target=self._run, name="x12-archive", daemon=True)
+        self._thread.start()
+
+    def _open_archive(self):
+        name = self.archive_path.name.lower()
+        if name.endswith(".zip"):
+            self._zip = zipfile.ZipFile(self.archive_path, "w", compression=zipfile.ZIP_DEFLATED)
+            self._tar = None
+        elif name.endswith((".tar.gz", ".tgz")):
+            self._zip, self._tar = None, tarfile.open(self.archive_path, "w:gz")
+        elif name.endswith(".tar"):
+            self._zip, self._tar = None, tarfile.open(self.archive_path, "w")
+        else:
+            raise ValueError(f"Unsupported archive type: {self.archive_path} (use .zip, .tar, .tar.gz or .tgz)")
+
+    def write(self, name, text):
+        if self._error:
+            raise self._error
+        self._queue.put((name, text.encode("utf-8")))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error:
+                continue  # keep draining so the producer never blocks forever
+            name, data = item
+            try:
+                if self._zip is not None:
+                    self._zip.writestr(name, data)
+                else:
+                    info = tarfile.TarInfo(name)
+                    info.size = len(data)
+                    info.mtime = int(time.time())
+                    self._tar.addfile(info, io.BytesIO(data))
+                self.files_written += 1
+            except Exception as e:
+                self._error = e
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._close_archive()
+        if self._error:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._queue.put(None)
+            self._thread.join()
+            self._close_archive()
+
+    def _close_archive(self):
+        if self._zip is not None:
+            self._zip.close()
+        else:
+            self._tar.close()
+
+
+def open_claim_sink(output_dir, archive=None, workers=4):
+    # A directory of files, or a single archive when archive is a path
+    if archive:
+        return ArchiveSink(archive)
+    return DirectorySink(output_dir, workers=workers)
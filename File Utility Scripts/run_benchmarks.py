@@ -0,0 +1,169 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from CSV_to_JSON import OUTPUT_FORMATS, csv_to_nested_json, peak_memory_mb
+from JSON_to_CSV import json_to_csv
+from claim_io import iter_claims
+from generateDentalX12_Batch import write_dental_x12_batch
+from generateDentalX12_Single import generate_dental_x12_single
+from synthetic_claims import write_synthetic_csv
+from x12_writer import WRITE_BUFFER
+
+STAGES = ("csv_to_json", "csv_to_json_parallel", "json_to_csv", "batch", "single")
+DEFAULT_BASELINE = Path(__file__).with_name("benchmark_baseline.json")
+# Allowed drop in rows/s (and growth in peak RSS) before a stage counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+
+def _csv_to_json(csv_path, json_path, workdir):
+    csv_to_nested_json(csv_path, workdir / "json", stream=True, output_format=json_path.suffix[1:])
+
+
+def _csv_to_json_parallel(csv_path, json_path, workdir):
+    csv_to_nested_json(csv_path, workdir / "json_parallel", output_format=json_path.suffix[1:],
+                       workers=os.cpu_count() or 1)
+
+
+def _json_to_csv(csv_path, json_path, workdir):
+    json_to_csv(json_path, workdir / "csv")
+
+
+def _batch(csv_path, json_path, workdir):
+    with open(workdir / "Batch_837D.txt", "w", encoding="utf-8", buffering=WRITE_BUFFER) as f:
+        write_dental_x12_batch(iter_claims(json_path), f)
+
+
+def _single(csv_path, json_path, workdir):
+    # No state_path: benchmark runs must not advance the real control numbers
+    generate_dental_x12_single(json_path, output_dir=workdir / "single", state_path=None)
+
+
+_STAGE_FUNCTIONS = {
+    "csv_to_json": _csv_to_json, "csv_to_json_parallel": _csv_to_json_parallel, "json_to_csv": _json_to_csv,
+    "batch": _batch, "single": _single,
+}
+
+
+def _run_stage(stage, csv_path, json_path, workdir):
+    # Runs in a fresh process, so peak RSS belongs to this stage alone
+    start = time.perf_counter()
+    _STAGE_FUNCTIONS[stage](Path(csv_path), Path(json_path), Path(workdir))
+    return time.perf_counter() - start, peak_memory_mb()
+
+
+def measure(stage, csv_path, json_path, workdir):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(_run_stage, stage, str(csv_path), str(json_path), str(workdir)).result()
+
+
+def run_benchmarks(rows, stages=STAGES, workdir=None, max_lines=4, providers=50, subscribers=None,
+                   unsorted=False, seed=0, output_format="json"):
+    # Generates the synthetic export, then times each stage on it. The JSON
+    # (or .jsonl) that the later stages read is always produced, timed or not.
+    with tempfile.TemporaryDirectory(prefix="x12-bench-") as tmp:
+        workdir = Path(workdir or tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        csv_path = write_synthetic_csv(workdir / "claims.csv", rows, max_lines, providers, subscribers, unsorted, seed)
+        json_path = workdir / "json" / f"claims.{output_format}"
+
+        results = {}
+        if "csv_to_json" not in stages:
+            measure("csv_to_json", csv_path, json_path, workdir)
+        for stage in STAGES:
+            if stage not in stages:
+                continue
+            seconds, peak = measure(stage, csv_path, json_path, workdir)
+            results[stage] = {
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(rows / seconds, 1),
+                "peak_rss_mb": round(peak, 1) if peak is not None else None,
+            }
+            print(f"{stage:20} {seconds:9.2f} s {rows / seconds:12.0f} rows/s"
+                  f"{'' if peak is None else f'{peak:10.1f} MB peak RSS'}")
+        if "csv_to_json" in results and "csv_to_json_parallel" in results:
+            speedup = results["csv_to_json"]["seconds"] / results["csv_to_json_parallel"]["seconds"]
+            results["csv_to_json_parallel"]["speedup"] = round(speedup, 2)
+            print(f"Parallel CSV ingestion on {os.cpu_count()} CPUs: {speedup:.2f}x the serial stream")
+    return {"rows": rows, "unsorted": unsorted, "seed": seed, "format": output_format, "cpus": os.cpu_count(),
+            "stages": results}
+
+
+def compare_to_baseline(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    # A list of human-readable regressions; empty when every stage is within tolerance
+    regressions = []
+    for stage, result in report["stages"].items():
+        expected = baseline.get("stages", {}).get(stage)
+        if not expected:
+            continue
+        floor = expected["rows_per_second"] * (1 - tolerance)
+        if result["rows_per_second"] < floor:
+            regressions.append(f"{stage}: {result['rows_per_second']:.0f} rows/s is below the baseline "
+                               f"{expected['rows_per_second']:.0f} rows/s by more than {tolerance:.0%}")
+        if result["peak_rss_mb"] is not None and expected.get("peak_rss_mb") is not None:
+            ceiling = expected["peak_rss_mb"] * (1 + tolerance)
+            if result["peak_rss_mb"] > ceiling:
+                regressions.append(f"{stage}: peak RSS {result['peak_rss_mb']:.1f} MB is above the baseline "
+                                   f"{expected['peak_rss_mb']:.1f} MB by more than {tolerance:.0%}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time each claim conversion stage on a synthetic export.")
+    parser.add_argument("--rows", type=int, default=100_000, help="CSV rows in the synthetic export")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--max-lines", type=int, default=4, help="procedure lines per claim, at most")
+    parser.add_argument("--providers", type=int, default=50)
+    parser.add_argument("--subscribers", type=int)
+    parser.add_argument("--unsorted", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json", help="intermediate claim file format")
+    parser.add_argument("--workdir", help="keep the generated files here instead of a temp directory")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the new baseline")
+    parser.add_argument("--output", help="also write this run's results as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.rows, args.stages, args.workdir, args.max_lines, args.providers,
+                            args.subscribers, args.unsorted, args.seed, args.format)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=4) + "\n", encoding="utf-8")
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(report, indent=4) + "\n", encoding="utf-8")
+        print(f"Baseline saved to: {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+        return 0
+
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    if (baseline.get("rows"), baseline.get("unsorted"), baseline.get("format", "json")) != \
+            (report["rows"], report["unsorted"], report["format"]):
+        print(f"Note: baseline was recorded with {baseline.get('rows')} rows"
+              f"{' (unsorted)' if baseline.get('unsorted') else ''} and {baseline.get('format', 'json')} claims;"
+              f" throughput may not be comparable")
+    unchecked = [stage for stage in report["stages"] if stage not in baseline.get("stages", {})]
+    if unchecked:
+        print(f"Note: baseline has no {', '.join(unchecked)} results to check against;"
+              f" run with --save-baseline to record them")
+    regressions = compare_to_baseline(report, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if regressions:
+        print(f"{len(regressions)} benchmark regressions against {baseline_path}", file=sys.stderr)
+        return 1
+    print(f"All stages within {args.tolerance:.0%} of {baseline_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
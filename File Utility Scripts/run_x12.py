@@ -1,23 +1,52 @@
 import json
 import csv
 import traceback
+from claim_cache import ClaimBlockCache
 from generateDentalX12_Batch import generate_dental_x12_batch
+from instrumentation import DEFAULT_METRICS_DIR, get_instrumentation
+from x12_envelope import CONTROL_NUMBER_STATE
+from x12_validator import validate_files, write_error_log
 #from generateDentalX12_Single import generate_dental_x12_single
 
 
-def generate():
+def generate(use_cache=False, validate=False, workers=None, metrics_dir=None, profile=False):
+    # metrics_dir turns on per-stage timings and counters (see instrumentation.py); profile adds cProfile
+    instrumentation = get_instrumentation(metrics_dir is not None, profile)
     try:
         json_file_path = "Output/JSON_Output/mockedDentalClaim.json"
-        generate_dental_x12_batch(json_file_path)
+        if use_cache:
+            # Only claims that changed since the last run are re-rendered
+            with ClaimBlockCache() as cache:
+                batch_path = generate_dental_x12_batch(json_file_path, cache=cache, instrumentation=instrumentation,
+                                                       state_path=CONTROL_NUMBER_STATE)
+            print(f"Claim cache: {cache.hits} reused, {cache.misses} rendered, {cache.evicted} evicted")
+            instrumentation.count("cache_hits", cache.hits)
+            instrumentation.count("cache_misses", cache.misses)
+        else:
+            batch_path = generate_dental_x12_batch(json_file_path, instrumentation=instrumentation,
+                                                   state_path=CONTROL_NUMBER_STATE)
 
         # json_file_path = "Output/JSON_Output/mockedDentalClaim.json"
-        # generate_dental_x12_single(json_file_path)
+        # generate_dental_x12_single(json_file_path, state_path=CONTROL_NUMBER_STATE)
+
+        if validate:
+            # Structural checks over everything just written; pass several paths to validate them in parallel
+            with instrumentation.span("validate"):
+                results = validate_files([batch_path], workers=workers)
+            error_count = sum(len(errors) for errors in results.values())
+            instrumentation.count("validation_errors", error_count)
+            log_path = write_error_log(results, "Output/.837D Error Logs/.837D_Errors.txt")
+            print(f"Validation: {error_count} errors in {len(results)} files, see {log_path}")
 
 
     except Exception as e:
         print(f"Failed to generate X12 file: {e}")
         traceback.print_exc()
+        instrumentation.count("failures")
+
+    instrumentation.write_reports(metrics_dir or DEFAULT_METRICS_DIR)
 
-generate()
+if __name__ == "__main__":
+    generate()
 
     
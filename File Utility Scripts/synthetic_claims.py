@@ -0,0 +1,165 @@
+import argparse
+import csv
+import random
+from functools import lru_cache
+from pathlib import Path
+
+# Same columns, in the same order, as CSV/mockedDentalClaim.csv
+CSV_FIELDS = [
+    "ClaimID", "ClaimAmount", "PlaceOfService", "FacilityCode", "PatientSignatureOnFile",
+    "InsuranceAssignment", "ReleaseOfInformation", "TreatmentResultingCode", "ICN",
+    "PayerName", "PayerID",
+    "BillingProviderName", "BillingProviderNPI", "BillingProviderAddress", "BillingProviderAddress2",
+    "BillingProviderCity", "BillingProviderState", "BillingProviderZip", "BillingProviderTaxID",
+    "BillingProviderTaxonomy",
+    "SubscriberID", "SubscriberLastName", "SubscriberFirstName", "SubscriberMiddle", "SubscriberDOB",
+    "SubscriberGender", "SubscriberAddress", "SubscriberAddress2", "SubscriberCity", "SubscriberState",
+    "SubscriberZip",
+    "RenderingProviderFirstName", "RenderingProviderLastName", "RenderingProviderMiddle",
+    "RenderingProviderNPI",
+    "ProcedureCode", "Fee", "Units", "Quantity", "ReplacementIndicator", "AreaOfOralCavity",
+    "DiagnosisCodePointer", "ToothNumber", "ToothSurfaceCode", "ToothSystem", "ProcedureDate"
+]
+
+# Rows held back and emitted in random order when writing an unsorted export
+SHUFFLE_WINDOW = 10_000
+
+PAYERS = [
+    ("Best Dental Insurance", "12345"), ("Smile Mutual", "60054"), ("Delta Coast Dental", "94276"),
+    ("Guardian Plus", "64246"), ("United Bright", "52133"), ("MetroDent", "65978"),
+]
+# (procedure code, fee, tooth-specific)
+PROCEDURES = [
+    ("D0120", 55, False), ("D0150", 95, False), ("D0210", 140, False), ("D1110", 100, False),
+    ("D1120", 75, False), ("D2140", 150, True), ("D2330", 175, True), ("D2740", 1150, True),
+    ("D3310", 800, True), ("D7140", 200, True),
+]
+SURFACES = ["M", "O", "D", "B", "L", "MO", "DO", "MOD"]
+AREAS = ["UR", "UL", "LR", "LL", "00"]
+LAST_NAMES = ["Smith", "Johnson", "Lee", "Garcia", "Brown", "Nguyen", "Patel", "O'Brien", "Kim", "Davis"]
+FIRST_NAMES = ["Jane", "John", "Maria", "Wei", "Aisha", "Carlos", "Emily", "Omar", "Grace", "Liam"]
+STREETS = ["Main St", "Elm St", "Oak Ave", "Cedar Rd", "Maple Dr", "Pine Ln", "Harbor Blvd"]
+CITIES = [("Anytown", "CA", "90210"), ("Springfield", "IL", "62704"), ("Riverside", "TX", "75001"),
+          ("Fairview", "NY", "10001"), ("Lakeside", "WA", "98101")]
+
+
+def _entity_rng(seed, kind, index):
+    # Providers and subscribers are rebuilt from their index instead of being
+    # kept in memory, so millions of subscribers cost nothing to generate
+    return random.Random(seed * 1_000_003 + kind * 7_919 + index)
+
+
+def _address(rng):
+    city, state, zip_code = rng.choice(CITIES)
+    address = f"{rng.randint(1, 9999)} {rng.choice(STREETS)}"
+    roll = rng.random()
+    if roll < 0.002:
+        address += ', Bldg "B"\nRear entrance'  # exports do carry quotes and line breaks
+    elif roll < 0.02:
+        address += ", Apt 4"
+    address2 = f"Suite {rng.randint(100, 999)}" if rng.random() < 0.2 else ""
+    return (address, address2, city, state, zip_code)
+
+
+@lru_cache(maxsize=1 << 16)
+def _provider(seed, index):
+    rng = _entity_rng(seed, 1, index)
+    last = rng.choice(LAST_NAMES)
+    return ((f"Dr. {rng.choice(FIRST_NAMES)} {last}", f"1{index:09d}") + _address(rng)
+            + (f"{rng.randint(10, 99)}{index:07d}", rng.choice(["1223G0001X", "122300000X", "1223P0221X"])))
+
+
+@lru_cache(maxsize=1 << 16)
+def _subscriber(seed, index):
+    rng = _entity_rng(seed, 2, index)
+    dob = f"{rng.randint(1940, 2015)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    return ((f"SUB{index:09d}", rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES),
+             rng.choice(["", "A", "B", "J"]), dob, rng.choice("FM")) + _address(rng))
+
+
+@lru_cache(maxsize=1 << 16)
+def _rendering_provider(seed, index):
+    rng = _entity_rng(seed, 3, index)
+    return (rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), "", f"2{index:09d}")
+
+
+def iter_claim_rows(rows, max_lines=4, providers=50, subscribers=None, seed=0):
+    # Yields CSV rows (tuples in CSV_FIELDS order), claim by claim, until rows
+    # rows have been produced. Each claim has 1..max_lines procedure lines and a
+    # ClaimAmount equal to the sum of its fees. subscribers defaults to one per
+    # three claims.
+    rng = random.Random(seed)
+    if not subscribers:
+        subscribers = max(1, int(rows / ((max_lines + 1) / 2) / 3))
+    produced = 0
+    claim_number = 0
+    while produced < rows:
+        claim_number += 1
+        provider_index = rng.randrange(providers)
+        subscriber_index = rng.randrange(subscribers)
+        payer = PAYERS[subscriber_index % len(PAYERS)]
+        year, month, day = 2025, rng.randint(1, 12), rng.randint(1, 28)
+
+        lines = []
+        for _ in range(min(rng.randint(1, max_lines), rows - produced)):
+            code, fee, tooth_specific = rng.choice(PROCEDURES)
+            tooth = str(rng.randint(1, 32)) if tooth_specific else ""
+            surface = rng.choice(SURFACES) if tooth_specific and rng.random() < 0.7 else ""
+            lines.append((code, str(fee), "1", "1", "", rng.choice(AREAS), "1", tooth, surface,
+                          "JP" if tooth else "", f"{year}-{month:02d}-{day:02d}"))
+        amount = str(sum(int(line[1]) for line in lines))
+
+        claim = ((f"CLM{claim_number:09d}", amount, "11", "B", "Y", "Y", "Y", "B",
+                  f"ICN{claim_number:09d}" if rng.random() < 0.1 else "", payer[0], payer[1])
+                 + _provider(seed, provider_index) + _subscriber(seed, subscriber_index)
+                 + _rendering_provider(seed, provider_index * 3 + rng.randrange(3)))
+        for line in lines:
+            yield claim + line
+        produced += len(lines)
+
+
+def shuffle_rows(rows, window=SHUFFLE_WINDOW, seed=0):
+    # Bounded-memory shuffle: a claim's lines end up scattered among the rows
+    # around them, which is what exports sorted by date or provider look like
+    rng = random.Random(seed)
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) > window:
+            i = rng.randrange(len(buffer))
+            buffer[i], buffer[-1] = buffer[-1], buffer[i]
+            yield buffer.pop()
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def write_synthetic_csv(csv_path, rows, max_lines=4, providers=50, subscribers=None, unsorted=False, seed=0):
+    csv_path = Path(csv_path)
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    records = iter_claim_rows(rows, max_lines, providers, subscribers, seed)
+    if unsorted:
+        records = shuffle_rows(records, seed=seed)
+    with csv_path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_FIELDS)
+        writer.writerows(records)
+    print(f"Synthetic CSV with {rows} rows written to: {csv_path}")
+    return csv_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic claims CSV export.")
+    parser.add_argument("csv_path")
+    parser.add_argument("--rows", type=int, default=100_000, help="procedure lines (CSV rows) to write")
+    parser.add_argument("--max-lines", type=int, default=4, help="procedure lines per claim, at most")
+    parser.add_argument("--providers", type=int, default=50, help="distinct billing providers")
+    parser.add_argument("--subscribers", type=int, help="distinct subscribers (default: one per three claims)")
+    parser.add_argument("--unsorted", action="store_true", help="scatter each claim's rows instead of grouping them")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_synthetic_csv(args.csv_path, args.rows, args.max_lines, args.providers, args.subscribers,
+                        args.unsorted, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from claim_cache import ClaimBlockCache
+from claim_io import iter_claims, write_claims_jsonl
+from generateDentalX12_Batch import _read_claims, write_dental_x12_batch
+from test_x12_templates import MOCK_JSON
+from x12_envelope import ControlNumberAllocator
+
+
+def write_batch(claims_path, cache, consolidate):
+    out = io.StringIO()
+    write_dental_x12_batch(_read_claims(claims_path, cache, consolidate), out, now=datetime(2026, 1, 2, 3, 4),
+                           allocator=ControlNumberAllocator(), consolidate=consolidate, cache=cache)
+    return out.getvalue()
+
+
+@pytest.mark.parametrize("consolidate", [False, True])
+def test_undecoded_claims_write_the_same_batch(tmp_path, consolidate):
+    # A warm run matches every .jsonl line through the index without decoding
+    # it, and must still write exactly what a run without the cache does
+    claims = list(iter_claims(MOCK_JSON))
+    claims[0]["Subscriber"] = "not a section"
+    claims[1]["Payer"].pop("Name")
+    claims_path = tmp_path / "claims.jsonl"
+    write_claims_jsonl(claims, claims_path)
+    expected = write_batch(claims_path, None, consolidate)
+
+    for hits in (0, len(claims)):
+        with ClaimBlockCache(tmp_path / "cache.sqlite3") as cache:
+            assert write_batch(claims_path, cache, consolidate) == expected
+            assert cache.hits == hits
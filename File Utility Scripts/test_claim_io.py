@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+from claim_io import iter_json_claims
+
+CLAIMS = [{"ClaimDetails": {"ClaimID": f"C{i:03d}", "Note": "é\U0001F600" * (i % 4), "Fee": 12.5e3,
+                            "Signed": True, "ICN": None}} for i in range(60)]
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 13, 100, 4096])
+def test_tokens_split_across_reads(tmp_path, chunk_size, ensure_ascii):
+    # Strings, \uXXXX surrogate pairs, numbers and literals cut by a read all decode
+    path = tmp_path / "claims.json"
+    path.write_text(json.dumps(CLAIMS, indent=4, ensure_ascii=ensure_ascii), encoding="utf-8")
+    assert list(iter_json_claims(path, chunk_size)) == CLAIMS
+
+
+@pytest.mark.parametrize("chunk_size", [7, 100, 1 << 20])
+def test_bad_json_reports_its_position(tmp_path, chunk_size):
+    # Reported where json.loads reports it, not read on to the end as a truncated array
+    text = json.dumps(CLAIMS, indent=4)
+    at = text.index('"Fee":', len(text) // 3)
+    text = text[:at] + '"Fee" 1' + text[at + len('"Fee":'):]
+    path = tmp_path / "claims.json"
+    path.write_text(text, encoding="utf-8")
+    with pytest.raises(json.JSONDecodeError) as expected:
+        json.loads(text)
+    with pytest.raises(ValueError) as raised:
+        list(iter_json_claims(path, chunk_size))
+    message = str(raised.value)
+    assert "Truncated" not in message
+    assert message.endswith(str(expected.value))
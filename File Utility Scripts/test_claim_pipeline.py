@@ -0,0 +1,20 @@
+import json
+import random
+
+from claim_pipeline import run_pipeline
+from test_csv_to_json import MOCK_CSV
+
+
+def test_fallback_does_not_use_control_numbers(tmp_path):
+    # The aborted grouped attempt must leave no gap in ISA13/GS06/ST02
+    header, *rows = MOCK_CSV.read_text(encoding="utf-8").splitlines()
+    random.Random(3).shuffle(rows)
+    csv_path = tmp_path / "shuffled.csv"
+    csv_path.write_text("\n".join([header] + rows) + "\n", encoding="utf-8")
+    state_path = tmp_path / "control_numbers.json"
+    run_pipeline(csv_path, tmp_path / "Batch_837D.txt", state_path=state_path)
+
+    batch = (tmp_path / "Batch_837D.txt").read_text(encoding="utf-8")
+    claims = len({row.split(",")[0] for row in rows})
+    assert batch.startswith("ISA*") and "*000000001*" in batch.splitlines()[0]
+    assert json.loads(state_path.read_text()) == {"interchange": 2, "group": 2, "transaction": claims + 1}
@@ -0,0 +1,74 @@
+import csv
+import io
+import random
+from pathlib import Path
+
+import pytest
+
+from CSV_to_JSON import csv_to_nested_json, encode_claims_parallel
+
+MOCK_CSV = Path(__file__).resolve().parent.parent / "CSV" / "mockedDentalClaim.csv"
+
+
+def write_export(path, claims=200, stray_quote=True):
+    # Two rows per claim, with a quoted multi-line address on every seventh
+    # claim and, optionally, one unquoted address holding a literal quote,
+    # which puts quote parity off from there on
+    with MOCK_CSV.open("r", encoding="utf-8", newline="") as f:
+        template = next(csv.DictReader(f))
+    out = io.StringIO()
+    writer = csv.DictWriter(out, list(template), lineterminator="\n")
+    writer.writeheader()
+    for i in range(claims):
+        for fee in ("10", "20"):
+            row = dict(template, ClaimID=f"C{i:04d}", Fee=fee)
+            if i % 7 == 0:
+                row["SubscriberAddress"] = 'Line "q", x\nnext'
+            elif i == 50 and fee == "10" and stray_quote:
+                row["SubscriberAddress"] = "STRAY_QUOTE"
+            writer.writerow(row)
+    path.write_text(out.getvalue().replace("STRAY_QUOTE", '12 Main St 5" wide'), encoding="utf-8")
+
+
+def serial_records(path, tmp_path):
+    # The claim lines the in-memory path writes, one csv.DictReader pass
+    jsonl_path = csv_to_nested_json(path, tmp_path / "serial", output_format="jsonl")
+    return jsonl_path.read_bytes().splitlines()
+
+
+@pytest.mark.parametrize("chunk_bytes", [64, 100, 257, 1000, 5000])
+def test_stray_quote_in_unquoted_field(tmp_path, chunk_bytes):
+    # Quote parity is thrown off by the literal quote; the result must still
+    # match a single csv.DictReader pass
+    path = tmp_path / "claims.csv"
+    write_export(path)
+    records = encode_claims_parallel(path, "jsonl", workers=1, chunk_bytes=chunk_bytes)
+    assert len(records) == 200
+    assert [record for _, record in records] == serial_records(path, tmp_path)
+
+
+def test_quoted_newlines_stay_parallel(tmp_path, capsys):
+    path = tmp_path / "claims.csv"
+    write_export(path, stray_quote=False)
+    records = encode_claims_parallel(path, "jsonl", workers=1, chunk_bytes=257)
+    assert "single pass" not in capsys.readouterr().out
+    assert [record for _, record in records] == serial_records(path, tmp_path)
+
+
+def test_external_grouping_matches_in_memory(tmp_path, capsys):
+    # Unsorted rows spilled in many small runs, with one row carrying an extra
+    # field and one cut short, must group exactly as the in-memory path does
+    path = tmp_path / "claims.csv"
+    write_export(path, stray_quote=False)
+    header, *rows = list(csv.reader(path.open("r", encoding="utf-8", newline="")))
+    random.Random(0).shuffle(rows)
+    rows[3].append("extra")
+    rows[5] = rows[5][:10]
+    with path.open("w", encoding="utf-8", newline="") as f:
+        csv.writer(f, lineterminator="\n").writerows([header] + rows)
+    for output_format in ("json", "jsonl"):
+        streamed = csv_to_nested_json(path, tmp_path / "stream", stream=True, spill_bytes=2000,
+                                      output_format=output_format)
+        in_memory = csv_to_nested_json(path, tmp_path / "memory", output_format=output_format)
+        assert "falling back to external grouping" in capsys.readouterr().out
+        assert streamed.read_bytes() == in_memory.read_bytes()
@@ -0,0 +1,123 @@
+import gzip
+from datetime import datetime
+
+import pytest
+
+import generateDentalX12_Batch
+from CSV_to_JSON import iter_grouped_claims
+from generateDentalX12_Batch import write_dental_x12_batch, write_rotating_batches
+from synthetic_claims import CSV_FIELDS, iter_claim_rows
+from x12_envelope import ControlNumberAllocator
+from x12_validator import validate_file
+
+NOW = datetime(2026, 1, 2, 3, 4)
+
+
+def synthetic_claims(rows, **options):
+    return list(iter_grouped_claims(dict(zip(CSV_FIELDS, row)) for row in iter_claim_rows(rows, **options)))
+
+
+def transactions(path):
+    # The segments of each ST..SE in a batch, split into elements
+    sets = []
+    for segment in path.read_text(encoding="utf-8").split("~"):
+        elements = segment.strip().split("*")
+        if elements[0] == "ST":
+            sets.append([])
+        if sets and elements[0] not in ("GE", "IEA"):
+            sets[-1].append(elements)
+    return sets
+
+
+@pytest.mark.parametrize("max_claims", [5000, 3])
+def test_consolidated_hl_numbering(tmp_path, monkeypatch, max_claims):
+    # One 2000A loop per provider and one 2000B per subscriber in each ST,
+    # numbered from 1 there, with every subscriber under the provider before it;
+    # a payer continued in a new ST re-opens its loops there
+    monkeypatch.setattr(generateDentalX12_Batch, "MAX_CLAIMS_PER_TRANSACTION", max_claims)
+    claims = synthetic_claims(300, providers=3, subscribers=8)
+    path = tmp_path / "batch.txt"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        write_dental_x12_batch(claims, f, now=NOW, allocator=ControlNumberAllocator(), consolidate=True)
+    assert validate_file(path) == []
+
+    written = subscriber_loops = 0
+    for segments in transactions(path):
+        hls = [e for e in segments if e[0] == "HL"]
+        assert [e[1] for e in hls] == [str(n) for n in range(1, len(hls) + 1)]
+        loops, provider, subscriber = set(), None, None
+        for e in segments:
+            if e[0] == "HL" and e[3] == "20":
+                assert e[2] == ""
+                provider, subscriber = e[1], None
+            elif e[0] == "HL":
+                assert e[3] == "22" and e[2] == provider
+                subscriber = e[1]
+            elif e[0] == "CLM":
+                assert subscriber is not None
+            elif e[0] == "NM1" and e[1] in ("85", "IL"):
+                # A provider's NPI once per ST, a subscriber once per provider
+                loop = (e[1], e[-1], provider if e[1] == "IL" else None)
+                assert loop not in loops
+                loops.add(loop)
+        claim_count = sum(e[0] == "CLM" for e in segments)
+        assert 0 < claim_count <= max_claims
+        written += claim_count
+        subscriber_loops += sum(e[3] == "22" for e in hls)
+    assert written == len(claims)
+    if max_claims >= len(claims):
+        # Claims of a payer sharing provider and subscriber share their loops
+        groups = {(c["Payer"]["PayerID"], c["BillingProvider"]["NPI"], c["Subscriber"]["SubscriberID"])
+                  for c in claims}
+        assert subscriber_loops == len(groups) < len(claims)
+
+
+def check_rotated(tmp_path, manifest, claims):
+    # Every file a complete, valid interchange taking the next control numbers
+    numbers = [entry["interchange_control_number"] for entry in manifest["files"]]
+    assert numbers == [f"{n:09d}" for n in range(1, len(numbers) + 1)]
+    for entry in manifest["files"]:
+        path = tmp_path / entry["file"]
+        assert validate_file(path) == []
+        assert path.stat().st_size == entry["bytes"] == entry["stored_bytes"]
+        assert path.read_text(encoding="utf-8").endswith(f"~\nIEA*1*{entry['interchange_control_number']}~")
+    assert manifest["claims"] == sum(entry["claims"] for entry in manifest["files"]) == len(claims)
+
+
+@pytest.mark.parametrize("max_bytes", [3000, 20000])
+def test_rotation_stays_within_max_bytes(tmp_path, max_bytes):
+    # Trailers included, a file never passes max_bytes unless one claim alone does
+    claims = synthetic_claims(400)
+    manifest = write_rotating_batches(claims, tmp_path, max_bytes=max_bytes, now=NOW)
+    check_rotated(tmp_path, manifest, claims)
+    assert len(manifest["files"]) > 1
+    for entry in manifest["files"]:
+        assert entry["bytes"] <= max_bytes or entry["claims"] == 1
+
+
+@pytest.mark.parametrize("consolidate", [False, True])
+def test_rotation_on_max_claims(tmp_path, consolidate):
+    claims = synthetic_claims(400, providers=3, subscribers=8)
+    manifest = write_rotating_batches(claims, tmp_path, max_claims=40, consolidate=consolidate, now=NOW)
+    check_rotated(tmp_path, manifest, claims)
+    assert [entry["claims"] for entry in manifest["files"]][:-1] == [40] * (len(manifest["files"]) - 1)
+
+
+def test_single_claim_over_max_bytes_gets_its_own_file(tmp_path):
+    claims = synthetic_claims(20)
+    manifest = write_rotating_batches(claims, tmp_path, max_bytes=100, now=NOW)
+    check_rotated(tmp_path, manifest, claims)
+    assert [entry["claims"] for entry in manifest["files"]] == [1] * len(claims)
+
+
+def test_gzip_rotation_matches_plain(tmp_path):
+    # Compressed files hold exactly the plain files' text, and max_bytes
+    # bounds that text rather than what lands on disk
+    claims = synthetic_claims(400)
+    plain = write_rotating_batches(claims, tmp_path / "plain", max_bytes=20000, now=NOW)
+    packed = write_rotating_batches(claims, tmp_path / "gzip", max_bytes=20000, compression="gzip", now=NOW)
+    assert [entry["bytes"] for entry in packed["files"]] == [entry["bytes"] for entry in plain["files"]]
+    for plain_entry, packed_entry in zip(plain["files"], packed["files"]):
+        text = gzip.decompress((tmp_path / "gzip" / packed_entry["file"]).read_bytes())
+        assert text == (tmp_path / "plain" / plain_entry["file"]).read_bytes()
+        assert packed_entry["stored_bytes"] < packed_entry["bytes"]
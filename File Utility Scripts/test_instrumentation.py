@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from claim_io import iter_claims
+from generateDentalX12_Batch import write_rotating_batches
+from instrumentation import Instrumentation
+from test_x12_templates import MOCK_JSON
+
+
+def test_rotated_batches_count_bytes_written(tmp_path):
+    # Every rotated file's writes land in file_write, counted in UTF-8 bytes
+    claims = list(iter_claims(MOCK_JSON))
+    claims[0]["Subscriber"]["LastName"] = "Peña"
+    instrumentation = Instrumentation()
+    manifest = write_rotating_batches(claims, tmp_path, max_claims=2, now=datetime(2026, 1, 2, 3, 4),
+                                      instrumentation=instrumentation)
+    summary = instrumentation.finish()
+    assert len(manifest["files"]) > 1
+    assert "file_write" in summary["stages"]
+    assert summary["counters"]["bytes_written"] == sum(entry["bytes"] for entry in manifest["files"])
+    assert summary["counters"]["bytes_written"] == sum((tmp_path / entry["file"]).stat().st_size
+                                                      for entry in manifest["files"])
@@ -0,0 +1,37 @@
+import asyncio
+import shutil
+
+import x12_daemon
+from test_csv_to_json import MOCK_CSV
+from x12_daemon import WatchFolderDaemon
+
+
+def test_failed_write_leaves_no_trace(tmp_path, monkeypatch):
+    # A write that dies halfway (a full disk) must leave no .tmp in the outbox
+    # and no gap in the control numbers once the retry goes through
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    shutil.copy(MOCK_CSV, inbox / "claims.csv")
+    write = x12_daemon.write_dental_x12_batch
+    failures = [1]
+
+    def full_disk(claims, f, **options):
+        if failures[0]:
+            failures[0] -= 1
+            write(claims, f, **options)
+            raise OSError(28, "No space left on device")
+        return write(claims, f, **options)
+
+    monkeypatch.setattr(x12_daemon, "write_dental_x12_batch", full_disk)
+    daemon = WatchFolderDaemon(inbox, tmp_path / "outbox", max_claims=100, state_path=None)
+
+    async def run():
+        assert not await daemon.run_once()
+        assert await daemon.flush_all()
+
+    asyncio.run(run())
+    files = sorted((tmp_path / "outbox").iterdir())
+    assert all(not path.name.endswith(".tmp") for path in files)
+    interchanges = sorted(path.read_text(encoding="utf-8").split("*")[13] for path in files)
+    assert interchanges == [str(n).zfill(9) for n in range(1, len(files) + 1)]
+    assert list((inbox / "processed").iterdir()) and not list((inbox / "processing").iterdir())
@@ -0,0 +1,16 @@
+from pathlib import Path
+
+from bench_render import legacy_render_claim
+from claim_io import iter_claims
+from x12_templates import render_claim
+
+MOCK_JSON = Path(__file__).resolve().parent.parent / "Output" / "JSON_Data" / "mockedDentalClaim.json"
+
+
+def test_templates_match_legacy_render():
+    # A missing ToothSystem defaults to JP; an empty one stays empty, as get_field(default=) did
+    claims = list(iter_claims(MOCK_JSON))
+    claims.append({"ProcedureLines": [{"ToothNumber": "1"}, {"ToothNumber": "2", "ToothSystem": ""},
+                                      {"ToothSurfaceCode": "M", "ToothSystem": "JO"}, {}]})
+    for claim in claims:
+        assert render_claim(claim, "20260101", "1200") == legacy_render_claim(claim, "20260101", "1200")
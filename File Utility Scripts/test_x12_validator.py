@@ -0,0 +1,67 @@
+import io
+from datetime import datetime
+
+import pytest
+
+from generateDentalX12_Batch import write_dental_x12_batch
+from test_generate_dental_x12_batch import synthetic_claims
+from x12_envelope import ControlNumberAllocator
+from x12_validator import validate_file, validate_files
+
+# (first segment starting with, its replacement elements, the one error code that must come back)
+CORRUPTIONS = [
+    ("SE*", lambda e: [e[0], str(int(e[1]) - 1), e[2]], "segment_count_mismatch"),
+    ("SE*", lambda e: [e[0], e[1], "9999"], "control_number_mismatch"),
+    ("GE*", lambda e: [e[0], "9", e[2]], "count_mismatch"),
+    ("IEA*", lambda e: [e[0], e[1], "000000009"], "control_number_mismatch"),
+    ("HL*2*", lambda e: [e[0], "3"] + e[2:], "hl_sequence"),
+    ("HL*2*", lambda e: e[:2] + ["7"] + e[3:], "hl_parent"),
+    ("CLM*", lambda e: e[:2] + ["1"] + e[3:], "claim_total_mismatch"),
+    ("CLM*", lambda e: e[:2] + ["1O0"] + e[3:], "bad_amount"),
+    ("SBR*", lambda e: ["SV3", "AD:D0150", "95", "", "00", "", "1", ""], "outside_claim"),
+    ("DTP*", lambda e: e[:3] + ["20251340"], "bad_date"),
+    ("DMG*", lambda e: e[:2] + ["1995-03-27"] + e[3:], "bad_date"),
+    ("PER*", lambda e: ["BHT", "0019", "00", "X", "20260102", "0304", "CH"], "duplicate_bht"),
+    ("IEA*", None, "missing_trailer"),
+    ("LX*", None, "segment_count_mismatch"),
+]
+
+
+def batch_segments():
+    out = io.StringIO()
+    write_dental_x12_batch(synthetic_claims(12), out, now=datetime(2026, 1, 2, 3, 4),
+                           allocator=ControlNumberAllocator())
+    return out.getvalue().split("~\n")
+
+
+def write_segments(path, segments):
+    path.write_text("~\n".join(segments), encoding="utf-8", newline="")
+    return path
+
+
+def test_generated_batch_is_clean(tmp_path):
+    assert validate_file(write_segments(tmp_path / "batch.txt", batch_segments())) == []
+
+
+@pytest.mark.parametrize("prefix, replace, code", CORRUPTIONS)
+def test_error_codes(tmp_path, prefix, replace, code):
+    # One broken segment (or, with no replacement, one dropped) gives exactly
+    # its own error code, at that segment's byte offset
+    segments = batch_segments()
+    at = next(i for i, segment in enumerate(segments) if segment.startswith(prefix))
+    if replace is None:
+        segments.pop(at)
+    else:
+        segments[at] = "*".join(replace(segments[at].rstrip("~").split("*"))) + ("~" if at == len(segments) - 1 else "")
+    errors = validate_file(write_segments(tmp_path / "batch.txt", segments))
+    assert {error["code"] for error in errors} == {code}
+    if replace is not None:
+        assert errors[0]["offset"] == sum(len(segment) + 2 for segment in segments[:at])
+
+
+def test_unreadable_files(tmp_path):
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    garbage = write_segments(tmp_path / "garbage.txt", ["NOT AN ISA"] + batch_segments()[1:])
+    results = validate_files([empty, garbage], workers=1)
+    assert [[error["code"] for error in errors] for errors in results.values()] == [["empty_file"], ["bad_isa"]]
@@ -0,0 +1,258 @@
+import argparse
+import asyncio
+import csv
+import signal
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+from CSV_to_JSON import ClaimsNotGroupedError, iter_external_claims, iter_grouped_claims
+from claim_io import iter_claims
+from generateDentalX12_Batch import get_field, write_dental_x12_batch
+from x12_envelope import CONTROL_NUMBER_STATE, MAX_CLAIMS_PER_TRANSACTION, ControlNumberAllocator
+from x12_writer import open_x12_output
+
+INBOX_SUFFIXES = (".csv", ".json", ".jsonl")
+# Drops are picked up once they have not been modified for this many seconds,
+# so a file that is still being copied in is never read half-written
+SETTLE_SECONDS = 1.0
+
+
+def load_claims(path):
+    # Claims from a CSV export (grouped by ClaimID or not), a JSON array or a .jsonl claim file
+    path = Path(path)
+    if path.suffix.lower() != ".csv":
+        return list(iter_claims(path))
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return list(iter_grouped_claims(csv.DictReader(f)))
+    except ClaimsNotGroupedError:
+        with path.open("r", encoding="utf-8") as f:
+            return list(iter_external_claims(csv.DictReader(f), tmp_dir=path.parent))
+
+
+class _PayerBuffer:
+    def __init__(self):
+        self.claims = []
+        self.sources = []  # source file for each buffered claim
+        self.oldest = None
+        self.retry = False  # the last write failed; flush_due tries again
+
+
+class WatchFolderDaemon:
+    # Watches inbox for CSV/JSON drops and micro-batches their claims, per
+    # payer, into 837D interchanges in outbox.
+    #
+    # A drop moves inbox -> inbox/processing when it is picked up, and on to
+    # inbox/processed once every one of its claims has been written out. A
+    # payer's buffer is flushed when it holds max_claims claims or its oldest
+    # claim has waited max_latency seconds. Stopping flushes every buffer
+    # first. A write that fails is logged and retried on the next tick, with
+    # its claims kept buffered. After a crash, whatever is still in
+    # processing/ is read again on the next start, so a claim may be sent
+    # twice but is never dropped.
+    def __init__(self, inbox, outbox="Output/.837D/Outbox", max_claims=1000, max_latency=30.0,
+                 poll_interval=1.0, state_path=CONTROL_NUMBER_STATE, consolidate=False):
+        self.inbox = Path(inbox)
+        self.outbox = Path(outbox)
+        self.processing = self.inbox / "processing"
+        self.processed = self.inbox / "processed"
+        self.failed = self.inbox / "failed"
+        for directory in (self.inbox, self.outbox, self.processing, self.processed, self.failed):
+            directory.mkdir(parents=True, exist_ok=True)
+        self.max_claims = min(max_claims, MAX_CLAIMS_PER_TRANSACTION)
+        self.max_latency = max_latency
+        self.poll_interval = poll_interval
+        self.consolidate = consolidate
+        self.allocator = ControlNumberAllocator(state_path=state_path)
+        self.buffers = {}
+        self.pending = {}  # source path -> claims not yet written out
+        self.files_written = 0
+        self.claims_written = 0
+        self._stopping = None
+        self._flush_lock = None
+
+    def stop(self):
+        if self._stopping is not None:
+            self._stopping.set()
+
+    async def run(self):
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):  # Windows, or not the main thread
+                pass
+
+        print(f"Watching {self.inbox} (flush at {self.max_claims} claims or {self.max_latency:g}s)")
+        # Drops interrupted by a crash or kill are picked up again first
+        for path in sorted(self.processing.iterdir()):
+            await self._ingest(path)
+        try:
+            while not self._stopping.is_set():
+                await self.poll()
+                await self.flush_due()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.flush_all()
+            print(f"Stopped: {self.claims_written} claims in {self.files_written} files written to {self.outbox}")
+            self._report_unwritten()
+
+    async def run_once(self):
+        # Picks up everything in the inbox now, flushes it all and returns
+        self._flush_lock = asyncio.Lock()
+        for path in sorted(self.processing.iterdir()):
+            await self._ingest(path)
+        await self.poll(settle=0)
+        written = await self.flush_all()
+        self._report_unwritten()
+        return written
+
+    async def poll(self, settle=SETTLE_SECONDS):
+        now = time.time()
+        drops = []
+        for path in self.inbox.iterdir():
+            if not path.is_file() or path.name.startswith(".") or path.suffix.lower() not in INBOX_SUFFIXES:
+                continue
+            mtime = path.stat().st_mtime
+            if now - mtime >= settle:
+                drops.append((mtime, path.name, path))
+        for _, _, path in sorted(drops):
+            claimed = self.processing / path.name
+            if claimed.exists():  # an earlier drop with the same name is still in flight
+                claimed = self.processing / f"{path.stem}_{time.time_ns()}{path.suffix}"
+            path.replace(claimed)
+            await self._ingest(claimed)
+
+    async def _ingest(self, path):
+        try:
+            claims = await asyncio.to_thread(load_claims, path)
+        except Exception as e:
+            print(f"Failed to read {path.name}: {e}")
+            path.replace(self.failed / path.name)
+            (self.failed / (path.name + ".error.txt")).write_text(traceback.format_exc(), encoding="utf-8")
+            return
+
+        print(f"Picked up {len(claims)} claims from {path.name}")
+        if not claims:
+            self._finish_source(path)
+            return
+        self.pending[path] = len(claims)
+        now = time.monotonic()
+        for claim in claims:
+            payer = get_field(claim, "Payer", "PayerID") or get_field(claim, "Payer", "Name")
+            buffer = self.buffers.setdefault(payer, _PayerBuffer())
+            if buffer.oldest is None:
+                buffer.oldest = now
+            buffer.claims.append(claim)
+            buffer.sources.append(path)
+            if len(buffer.claims) >= self.max_claims and not buffer.retry:
+                await self.flush(payer)
+
+    async def flush_due(self):
+        now = time.monotonic()
+        for payer, buffer in list(self.buffers.items()):
+            if buffer.claims and (buffer.retry or now - buffer.oldest >= self.max_latency):
+                await self.flush(payer)
+
+    async def flush_all(self):
+        # True once every buffer is written out
+        written = True
+        for payer in list(self.buffers):
+            written = await self.flush(payer) and written
+        return written
+
+    async def flush(self, payer):
+        # Writes the payer's buffer out, max_claims claims per interchange.
+        # Returns False if a write failed: the error is logged and the claims
+        # not yet written stay buffered, their drops in processing/.
+        async with self._flush_lock:
+            buffer = self.buffers.get(payer)
+            while buffer is not None and buffer.claims:
+                claims = buffer.claims[:self.max_claims]
+                try:
+                    path = await asyncio.to_thread(self._write_interchange, payer, claims)
+                except Exception as e:
+                    print(f"Failed to write {len(claims)} claims for payer {payer}: {e}")
+                    traceback.print_exc()
+                    buffer.retry = True
+                    return False
+                sources = buffer.sources[:len(claims)]
+                del buffer.claims[:len(claims)]
+                del buffer.sources[:len(claims)]
+                self.files_written += 1
+                self.claims_written += len(claims)
+                print(f"Flushed {len(claims)} claims for payer {payer} to {path.name}")
+                for source in sources:
+                    self.pending[source] -= 1
+                    if self.pending[source] == 0:
+                        del self.pending[source]
+                        self._finish_source(source)
+            self.buffers.pop(payer, None)
+            return True
+
+    def _report_unwritten(self):
+        unwritten = sum(len(buffer.claims) for buffer in self.buffers.values())
+        if unwritten:
+            print(f"{unwritten} claims could not be written; their drops stay in {self.processing} "
+                  f"and are read again on the next start")
+
+    def _write_interchange(self, payer, claims):
+        # Written under a temporary name and renamed, so anything picking files
+        # up from the outbox only ever sees complete interchanges
+        now = datetime.now()
+        safe_payer = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(payer)) or "unknown"
+        path = self.outbox / f"Batch_837D_{safe_payer}_{now:%Y%m%d%H%M%S%f}.txt"
+        tmp_path = path.with_name("." + path.name + ".tmp")
+        # A failed write leaves nothing behind: no partial file in the outbox,
+        # and the control numbers it took go to the retry
+        numbers = self.allocator.snapshot()
+        try:
+            with open_x12_output(tmp_path) as f:
+                write_dental_x12_batch(claims, f, now=now, allocator=self.allocator, consolidate=self.consolidate)
+            tmp_path.replace(path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            self.allocator.restore(numbers)
+            raise
+        self.allocator.save()
+        return path
+
+    def _finish_source(self, path):
+        target = self.processed / path.name
+        if target.exists():
+            target = self.processed / f"{path.stem}_{time.time_ns()}{path.suffix}"
+        path.replace(target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch an inbox for claim drops and batch them into 837D files.")
+    parser.add_argument("inbox", nargs="?", default="Inbox")
+    parser.add_argument("--outbox", default="Output/.837D/Outbox")
+    parser.add_argument("--max-claims", type=int, default=1000, help="flush a payer once it has this many claims")
+    parser.add_argument("--max-latency", type=float, default=30.0,
+                        help="flush a payer once its oldest claim has waited this many seconds")
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    parser.add_argument("--state", default=CONTROL_NUMBER_STATE,
+                        help="where the last control numbers used are kept between runs")
+    parser.add_argument("--consolidate", action="store_true", help="share HL loops between claims")
+    parser.add_argument("--once", action="store_true", help="process what is in the inbox now, then exit")
+    args = parser.parse_args(argv)
+
+    daemon = WatchFolderDaemon(args.inbox, args.outbox, args.max_claims, args.max_latency, args.poll_interval,
+                               args.state, args.consolidate)
+    if args.once:
+        return 0 if asyncio.run(daemon.run_once()) else 1
+    asyncio.run(daemon.run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import json
+from pathlib import Path
+
+# 005010X224A2 recommends no more than 5000 CLM segments per ST/SE transaction set
+MAX_CLAIMS_PER_TRANSACTION = 5000
+
+# Where the generators and the watch-folder service keep the last control
+# numbers used, so ISA13/GS06 never repeat from one run to the next
+CONTROL_NUMBER_STATE = "Output/.837D/control_numbers.json"
+
+
+def isa_segment(control_number, date, time):
+    return f"ISA*00*{'':10}*00*{'':10}*ZZ*SENDERID       *ZZ*RECEIVERID     *{date}*{time}*^*00501*{control_number}*1*T*:~"
+
+
+def gs_segment(control_number, full_date, time):
+    return f"GS*HC*SENDERID*RECEIVERID*{full_date}*{time}*{control_number}*X*005010X224A2~"
+
+
+def st_segment(st_number):
+    return f"ST*837*{st_number}*005010X224A2~"
+
+
+class ControlNumberAllocator:
+    # Hands out unique, gap-free ISA13 / GS06 / ST02 control numbers. Only the
+    # process that writes the envelopes should own one; workers never number
+    # anything themselves. With state_path the last numbers used survive
+    # between runs, so consecutive files never reuse an interchange number.
+    def __init__(self, interchange=1, group=1, transaction=1, state_path=None):
+        self.state_path = Path(state_path) if state_path else None
+        if self.state_path and self.state_path.exists():
+            with self.state_path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+            interchange = state["interchange"]
+            group = state["group"]
+            transaction = state["transaction"]
+        self._interchange = interchange
+        self._group = group
+        self._transaction = transaction
+
+    def next_interchange(self):
+        number = str(self._interchange).zfill(9)
+        # ISA13 is exactly nine digits, so wrap rather than overflow
+        self._interchange = self._interchange % 999999999 + 1
+        return number
+
+    def next_group(self):
+        number = str(self._group).zfill(9)
+        self._group = self._group % 999999999 + 1
+        return number
+
+    def next_transaction(self):
+        number = str(self._transaction).zfill(4)
+        self._transaction = self._transaction % 999999999 + 1
+        return number
+
+    def snapshot(self):
+        # The counters as they stand, for restore() to roll back to when
+        # whatever took numbers after this point never goes out
+        return self._interchange, self._group, self._transaction
+
+    def restore(self, snapshot):
+        self._interchange, self._group, self._transaction = snapshot
+
+    def save(self):
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"interchange": self._interchange, "group": self._group, "transaction": self._transaction}
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(state, f)
+        tmp_path.replace(self.state_path)
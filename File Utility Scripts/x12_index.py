@@ -0,0 +1,183 @@
+import argparse
+import json
+import mmap
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from claim_io import index_path
+from x12_envelope import CONTROL_NUMBER_STATE, ControlNumberAllocator, isa_segment, gs_segment, st_segment
+from x12_reader import iter_segments, read_separators
+from x12_writer import SegmentWriter, WRITE_BUFFER
+
+
+def _claim_keys(claim):
+    def field(section, key):
+        value = claim.get(section) if isinstance(claim, dict) else None
+        return value.get(key, "") if isinstance(value, dict) else ""
+    return field("ClaimDetails", "ClaimID"), field("Subscriber", "SubscriberID"), field("Payer", "PayerID")
+
+
+class BatchIndexWriter:
+    # Writes the sidecar index for an 837D batch as it is generated: one JSON
+    # line per claim with its ClaimID, SubscriberID and PayerID, the byte range
+    # [start, end) and 1-based line range of the claim's own segments, and the
+    # byte ranges of the loops it shares with other claims (the transaction
+    # header, billing provider and subscriber loops of a consolidated batch).
+    # Lines are segment numbers, one segment per line as the generator writes them.
+    # The last line records the batch size, so a stale index is noticed.
+    def __init__(self, f):
+        self.f = f
+        self.claims = 0
+
+    def add(self, claim, start, end, first_line, last_line, loops=()):
+        claim_id, subscriber_id, payer_id = _claim_keys(claim)
+        self.f.write(json.dumps({
+            "claim_id": claim_id, "subscriber_id": subscriber_id, "payer_id": payer_id,
+            "start": start, "end": end, "first_line": first_line, "last_line": last_line,
+            "loops": [list(loop) for loop in loops],
+        }))
+        self.f.write("\n")
+        self.claims += 1
+
+    def finish(self, x12_size):
+        self.f.write(json.dumps({"x12_size": x12_size, "claims": self.claims}))
+        self.f.write("\n")
+
+
+class BatchIndex:
+    # Reader for a batch and its sidecar index. Lookups return index entries,
+    # which extract() turns back into a standalone interchange.
+    def __init__(self, x12_path):
+        self.path = Path(x12_path)
+        self.entries = []
+        trailer = None
+        with open(index_path(self.path), "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if "claim_id" in record:
+                    self.entries.append(record)
+                else:
+                    trailer = record
+        size = self.path.stat().st_size
+        if trailer is None or trailer["x12_size"] != size:
+            raise ValueError(f"{index_path(self.path)} does not match {self.path}; regenerate the batch")
+        self._by_claim = {}
+        self._by_subscriber = {}
+        self._by_payer = {}
+        for entry in self.entries:
+            self._by_claim.setdefault(entry["claim_id"], []).append(entry)
+            self._by_subscriber.setdefault(entry["subscriber_id"], []).append(entry)
+            self._by_payer.setdefault(entry["payer_id"], []).append(entry)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def by_claim(self, claim_id):
+        return self._by_claim.get(claim_id, [])
+
+    def by_subscriber(self, subscriber_id):
+        return self._by_subscriber.get(subscriber_id, [])
+
+    def by_payer(self, payer_id):
+        return self._by_payer.get(payer_id, [])
+
+    def find(self, claim_ids=(), subscriber_ids=(), payer_ids=()):
+        # Entries matching any of the given keys, in batch order and without repeats
+        wanted = {}
+        for keys, lookup in ((claim_ids, self.by_claim), (subscriber_ids, self.by_subscriber),
+                             (payer_ids, self.by_payer)):
+            for key in keys:
+                for entry in lookup(key):
+                    wanted[entry["start"]] = entry
+        return [wanted[start] for start in sorted(wanted)]
+
+    def read_segments(self, entry):
+        # The claim's segments as raw text, shared loops first, read straight off the batch
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _read_segments(mm, read_separators(mm), entry)
+
+    def extract(self, entries, f, now=None, allocator=None):
+        return extract_interchange(self.path, entries, f, now, allocator)
+
+
+def _read_segments(buf, separators, entry):
+    element_sep, _, segment_term = separators
+    element = element_sep.decode("ascii")
+    terminator = segment_term.decode("ascii")
+    segments = []
+    for start, end in entry["loops"] + [[entry["start"], entry["end"]]]:
+        for _, _, elements in iter_segments(buf[start:end], separators):
+            if elements[0] == "HL":
+                # Every extracted claim carries its own loops: provider HL 1, subscriber HL 2
+                level = elements[3] if len(elements) > 3 else ""
+                elements = ["HL", "1", "", "20", "1"] if level == "20" else ["HL", "2", "1", "22", "0"]
+            segments.append(element.join(elements) + terminator)
+    return segments
+
+
+def extract_interchange(x12_path, entries, f, now=None, allocator=None):
+    # Writes the indexed claims to f as a new interchange, one ST/SE per claim
+    # like a non-consolidated batch, under fresh envelopes. Nothing is
+    # re-rendered: segments are copied from the batch as written.
+    now = now or datetime.now()
+    date = now.strftime("%y%m%d")
+    time = now.strftime("%H%M")
+    full_date = now.strftime("%Y%m%d")
+    allocator = allocator or ControlNumberAllocator()
+    control_number = allocator.next_interchange()
+    group_number = allocator.next_group()
+
+    out = SegmentWriter(f)
+    out.start_interchange(isa_segment(control_number, date, time))
+    out.start_group(gs_segment(group_number, full_date, time))
+    with open(x12_path, "rb") as x12, mmap.mmap(x12.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        separators = read_separators(mm)
+        for entry in entries:
+            st_number = allocator.next_transaction()
+            out.start_transaction(st_segment(st_number))
+            segments = _read_segments(mm, separators, entry)
+            out.write_block("\n".join(segments), len(segments))
+            out.write(f"SE*{out.transaction_segment_count()}*{st_number}~")
+    out.write(f"GE*{out.transaction_sets}*{group_number}~")
+    out.write(f"IEA*{out.groups}*{control_number}~")
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pull claims out of an indexed 837D batch into a new interchange.")
+    parser.add_argument("x12_path", nargs="?", default="Output/.837D/Batch_837D.txt")
+    parser.add_argument("--claim", nargs="+", default=[], metavar="CLAIM_ID")
+    parser.add_argument("--subscriber", nargs="+", default=[], metavar="SUBSCRIBER_ID")
+    parser.add_argument("--payer", nargs="+", default=[], metavar="PAYER_ID")
+    parser.add_argument("-o", "--output", help="write the interchange here (default: list the matches)")
+    parser.add_argument("--state", default=CONTROL_NUMBER_STATE,
+                        help="where the last control numbers used are kept between runs")
+    args = parser.parse_args(argv)
+
+    index = BatchIndex(args.x12_path)
+    entries = index.find(args.claim, args.subscriber, args.payer)
+    missing = [claim_id for claim_id in args.claim if not index.by_claim(claim_id)]
+    for claim_id in missing:
+        print(f"Claim {claim_id} is not in {args.x12_path}")
+    if not args.output:
+        for entry in entries:
+            print(f"{entry['claim_id']}\tsubscriber {entry['subscriber_id']}\tpayer {entry['payer_id']}"
+                  f"\tlines {entry['first_line']}-{entry['last_line']}\tbytes {entry['start']}-{entry['end']}")
+        return 1 if missing else 0
+    if not entries:
+        print("No matching claims; nothing written")
+        return 1
+
+    output_path = Path(args.output)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER) as f:
+        allocator = ControlNumberAllocator(state_path=args.state)
+        extract_interchange(args.x12_path, entries, f, allocator=allocator)
+    allocator.save()
+    print(f"{len(entries)} claims written to: {output_path}")
+    return 1 if missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
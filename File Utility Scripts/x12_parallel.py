@@ -0,0 +1,81 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from claim_io import claim_byte_ranges, iter_claims
+from x12_envelope import ControlNumberAllocator, isa_segment, gs_segment, st_segment
+from x12_templates import render_claim
+from x12_writer import SegmentWriter, open_x12_output
+
+# Bytes of claim file each worker task parses and renders; small enough that
+# the ranges in flight stay a few MB, large enough to keep task overhead low
+RANGE_BYTES = 4 << 20
+
+
+def render_range(claims_path, start, end, full_date, time):
+    # Runs in a worker process: reads and parses the claims starting in
+    # [start, end) of the claim file itself, so the parent never decodes or
+    # pickles a claim, and returns each claim's segments, joined, with their
+    # count. Envelopes and control numbers are left to the parent.
+    blocks = []
+    for claim in iter_claims(claims_path, start, end):
+        segments = render_claim(claim, full_date, time)
+        blocks.append(("\n".join(segments), len(segments)))
+    return blocks
+
+
+def write_dental_x12_parallel(claims_path, f, workers=None, now=None, allocator=None, range_bytes=RANGE_BYTES):
+    # Renders a claim file (.json or .jsonl) in a process pool, one byte range
+    # per task, and writes the same interchange as write_dental_x12_batch: one
+    # ISA/GS, every claim in its own ST/SE. Results are written back in file
+    # order, so control numbers come out sequential no matter which worker
+    # finishes first. A .json array only splits when json.dump(indent=4) wrote
+    # it (see json_byte_ranges); otherwise one worker takes the whole file.
+    now = now or datetime.now()
+    date = now.strftime("%y%m%d")
+    time = now.strftime("%H%M")
+    full_date = now.strftime("%Y%m%d")
+    allocator = allocator or ControlNumberAllocator()
+    workers = workers or os.cpu_count() or 1
+    size = Path(claims_path).stat().st_size
+    ranges = claim_byte_ranges(claims_path, max(workers, -(-size // range_bytes)))
+
+    control_number = allocator.next_interchange()
+    group_number = allocator.next_group()
+    out = SegmentWriter(f)
+    out.start_interchange(isa_segment(control_number, date, time))
+    out.start_group(gs_segment(group_number, full_date, time))
+
+    def write_range(blocks):
+        for block, segment_count in blocks:
+            st_number = allocator.next_transaction()
+            out.start_transaction(st_segment(st_number))
+            out.write_block(block, segment_count)
+            out.write(f"SE*{out.transaction_segment_count()}*{st_number}~")
+
+    # Keep a bounded number of ranges in flight so memory stays flat
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for start, end in ranges:
+            pending.append(pool.submit(render_range, str(claims_path), start, end, full_date, time))
+            if len(pending) >= workers * 2:
+                write_range(pending.popleft().result())
+        while pending:
+            write_range(pending.popleft().result())
+
+    out.write(f"GE*{out.transaction_sets}*{group_number}~")
+    out.write(f"IEA*{out.groups}*{control_number}~")
+    return out
+
+
+def generate_dental_x12_parallel(json_file_path, output_path="Output/.837D/Batch_837D.txt",
+                                 state_path=None, **options):
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    allocator = ControlNumberAllocator(state_path=state_path)
+    with open_x12_output(output_path) as f:
+        write_dental_x12_parallel(json_file_path, f, allocator=allocator, **options)
+    allocator.save()
+    print(f"X12 batch file written: {output_path}")
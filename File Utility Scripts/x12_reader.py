@@ -0,0 +1,241 @@
+import argparse
+import mmap
+from pathlib import Path
+
+from CSV_to_JSON import write_claims_json
+
+# ISA is fixed width: the element separator follows "ISA", and the component
+# separator and segment terminator are its last two characters
+ISA_LENGTH = 106
+_WHITESPACE = b" \t\r\n"
+
+
+class X12FormatError(Exception):
+    pass
+
+
+def read_separators(buf):
+    # (element, component, segment) separators declared by the ISA at the start of buf
+    start = 0
+    while buf[start:start + 1] in (b" ", b"\t", b"\r", b"\n"):
+        start += 1
+    isa = bytes(buf[start:start + ISA_LENGTH])
+    if len(isa) < ISA_LENGTH or not isa.startswith(b"ISA"):
+        raise X12FormatError("File does not start with a complete ISA segment")
+    return isa[3:4], isa[104:105], isa[105:106]
+
+
+def iter_segments(buf, separators=None):
+    # Yields (start, end, elements) for every segment in buf, where start/end
+    # are byte offsets of the segment text (terminator excluded) and elements
+    # are the decoded element strings, elements[0] being the segment ID
+    element_sep, _, segment_term = separators or read_separators(buf)
+    element_sep = element_sep.decode("ascii")
+    find = buf.find
+    size = len(buf)
+    pos = 0
+    while pos < size:
+        end = find(segment_term, pos)
+        if end == -1:
+            end = size
+        start = pos
+        # Skip the line breaks generators put between segments
+        while start < end and buf[start] in _WHITESPACE:
+            start += 1
+        if start < end:
+            yield start, end, buf[start:end].decode("utf-8").split(element_sep)
+        pos = end + 1
+
+
+def _date(d8):
+    # CCYYMMDD back to the CSV's YYYY-MM-DD
+    if len(d8) == 8 and d8.isdigit():
+        return f"{d8[:4]}-{d8[4:6]}-{d8[6:]}"
+    return d8
+
+
+def _element(elements, index):
+    return elements[index] if index < len(elements) else ""
+
+
+def _nm1_id(elements):
+    # NM109, falling back to NM108 for the subscriber (IL) and rendering
+    # provider (82) names, which the generators write one element early
+    if len(elements) > 9:
+        return elements[9]
+    if _element(elements, 7) in ("MI", "XX"):
+        return _element(elements, 8)
+    return ""
+
+
+def _new_billing_provider():
+    return {"ProviderName": "", "NPI": "", "Address": "", "Address2": "", "City": "", "State": "",
+            "Zip": "", "TaxID": "", "Taxonomy": ""}
+
+
+def _new_subscriber():
+    return {"SubscriberID": "", "LastName": "", "FirstName": "", "Middle": "", "DOB": "", "Gender": "",
+            "Address": "", "Address2": "", "City": "", "State": "", "Zip": ""}
+
+
+def _new_claim(payer, billing_provider, subscriber):
+    # Same shape and key order as CSV_to_JSON.csv_to_nested_json produces
+    return {
+        "ClaimDetails": {
+            "ClaimID": "", "ClaimAmount": "", "PlaceOfService": "", "FacilityCode": "",
+            "PatientSignatureOnFile": "", "InsuranceAssignment": "", "ReleaseOfInformation": "",
+            "TreatmentResultingCode": "", "ICN": ""
+        },
+        "Payer": dict(payer),
+        "BillingProvider": dict(billing_provider),
+        "Subscriber": dict(subscriber),
+        "RenderingProvider": {"FirstName": "", "LastName": "", "Middle": "", "NPI": ""},
+        "ProcedureLines": []
+    }
+
+
+def _new_line():
+    return {"ProcedureCode": "", "Fee": "", "Units": "", "Quantity": "", "ReplacementIndicator": "",
+            "AreaOfOralCavity": "", "DiagnosisCodePointer": "", "ToothNumber": "", "ToothSurfaceCode": "",
+            "ToothSystem": "", "ProcedureDate": ""}
+
+
+def iter_x12_claims(buf, separators=None):
+    # Rebuilds the nested claim dicts from 837D segments, one claim at a time.
+    # Works for both one-loop-per-claim and consolidated HL hierarchies. Fields
+    # the generators never write (Units, DiagnosisCodePointer, ICN unless a
+    # REF*F8 is present) come back as "".
+    separators = separators or read_separators(buf)
+    component_sep = separators[1].decode("ascii")
+
+    payer = {"Name": "", "PayerID": ""}
+    billing_provider = _new_billing_provider()
+    subscriber = _new_subscriber()
+    claim = None
+    line = None
+    entity = None  # which NM1 the following N3/N4 belong to
+
+    for _, _, e in iter_segments(buf, separators):
+        tag = e[0]
+
+        if tag == "CLM" or tag == "HL" or tag == "SE":
+            if claim is not None:
+                yield claim
+                claim = line = None
+
+        if tag == "HL":
+            level = _element(e, 3)
+            if level == "20":
+                billing_provider = _new_billing_provider()
+            elif level == "22":
+                subscriber = _new_subscriber()
+            entity = None
+
+        elif tag == "NM1":
+            entity = _element(e, 1)
+            if entity == "85":
+                billing_provider.update(ProviderName=_element(e, 3), NPI=_nm1_id(e))
+            elif entity == "IL":
+                subscriber.update(LastName=_element(e, 3), FirstName=_element(e, 4), Middle=_element(e, 5),
+                                  SubscriberID=_nm1_id(e))
+            elif entity in ("PR", "40"):
+                # NM1*40 (receiver) carries the payer until the subscriber loop's NM1*PR
+                payer = {"Name": _element(e, 3), "PayerID": _nm1_id(e)}
+            elif entity == "82" and claim is not None:
+                claim["RenderingProvider"].update(LastName=_element(e, 3), FirstName=_element(e, 4),
+                                                  Middle=_element(e, 5), NPI=_nm1_id(e))
+
+        elif tag in ("N3", "N4"):
+            target = billing_provider if entity == "85" else subscriber if entity == "IL" else None
+            if target is not None:
+                if tag == "N3":
+                    target.update(Address=_element(e, 1), Address2=_element(e, 2))
+                else:
+                    target.update(City=_element(e, 1), State=_element(e, 2), Zip=_element(e, 3))
+
+        elif tag == "REF":
+            if _element(e, 1) == "EI":
+                billing_provider["TaxID"] = _element(e, 2)
+            elif _element(e, 1) == "F8" and claim is not None:
+                claim["ClaimDetails"]["ICN"] = _element(e, 2)
+
+        elif tag == "DMG":
+            subscriber.update(DOB=_date(_element(e, 2)), Gender=_element(e, 3))
+
+        elif tag == "CLM":
+            claim = _new_claim(payer, billing_provider, subscriber)
+            facility = _element(e, 5).split(component_sep)
+            claim["ClaimDetails"].update(
+                ClaimID=_element(e, 1),
+                ClaimAmount=_element(e, 2),
+                PlaceOfService=facility[0],
+                FacilityCode=facility[1] if len(facility) > 1 else "",
+                PatientSignatureOnFile=_element(e, 6),
+                InsuranceAssignment=_element(e, 8),
+                ReleaseOfInformation=_element(e, 9),
+                TreatmentResultingCode=_element(e, 10),
+            )
+
+        elif claim is None:
+            continue
+
+        elif tag == "PRV":
+            claim["BillingProvider"]["Taxonomy"] = _element(e, 3)
+
+        elif tag == "LX":
+            line = _new_line()
+            claim["ProcedureLines"].append(line)
+
+        elif line is None:
+            continue
+
+        elif tag == "SV3":
+            procedure = _element(e, 1).split(component_sep)
+            line.update(
+                ProcedureCode=procedure[1] if len(procedure) > 1 else procedure[0],
+                Fee=_element(e, 2),
+                AreaOfOralCavity=_element(e, 4),
+                ReplacementIndicator=_element(e, 5),
+                Quantity=_element(e, 6),
+            )
+
+        elif tag == "DTP" and _element(e, 1) == "472":
+            line["ProcedureDate"] = _date(_element(e, 3))
+
+        elif tag == "TOO":
+            line.update(ToothSystem=_element(e, 1), ToothNumber=_element(e, 2), ToothSurfaceCode=_element(e, 3))
+
+    if claim is not None:
+        yield claim
+
+
+def read_x12_claims(x12_path):
+    # Memory-maps the file, so even multi-GB interchanges are read in bounded memory
+    with open(x12_path, "rb") as f:
+        if Path(x12_path).stat().st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter_x12_claims(mm)
+
+
+def x12_to_nested_json(x12_path, output_folder="Output/JSON_Output"):
+    x12_path = Path(x12_path)
+    output_folder = Path(output_folder)
+    output_folder.mkdir(parents=True, exist_ok=True)
+    json_path = output_folder / (x12_path.stem + ".json")
+    with json_path.open("w", encoding="utf-8") as f:
+        write_claims_json(read_x12_claims(x12_path), f)
+    print(f"Nested JSON created at: {json_path}")
+    return json_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read an 837D file back into the nested claim JSON.")
+    parser.add_argument("x12_path")
+    parser.add_argument("--output-folder", default="Output/JSON_Output")
+    args = parser.parse_args(argv)
+    x12_to_nested_json(args.x12_path, args.output_folder)
+
+
+if __name__ == "__main__":
+    main()
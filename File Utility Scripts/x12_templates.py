@@ -0,0 +1,248 @@
+import hashlib
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# Segment templates are compiled once, at import, into plain Python functions.
+#
+#   {Section.Key}    field from the record, "" when missing (same as get_field)
+#   {Key}            top-level field, used for procedure lines
+#   {$name}          value from the env dict passed at render time
+#   {path|B}         "B" when the field is empty
+#   {path?JP}        "JP" when the field is missing; an empty one stays empty
+#                    (get_field's default=)
+#   {path:date}      YYYY-MM-DD converted to YYYYMMDD ("" if it doesn't parse)
+#   [*{path}]        the bracketed text is only emitted when its fields are non-empty
+#
+# A template can also be a (template, when) pair, in which case the segment is
+# only emitted when at least one of the field paths in when is non-empty.
+
+_TOKEN = re.compile(r"\{([^{}]*)\}|\[|\]")
+_FIELD = re.compile(r"^(\$?\w+(?:\.\w+)*)(?::(\w+))?(?:([|?])(.*))?$")
+
+
+@lru_cache(maxsize=1 << 16)
+def _cached_x12_date(date_str):
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").strftime("%Y%m%d")
+    except (TypeError, ValueError):
+        return ""
+
+
+def x12_date(date_str):
+    # Memoized YYYY-MM-DD -> YYYYMMDD, "" if unparseable; claims in a run share a handful of service dates
+    try:
+        return _cached_x12_date(date_str)
+    except TypeError:  # unhashable value
+        return ""
+
+
+_FILTERS = {"date": "_date"}
+
+
+class _Compiler:
+    def __init__(self):
+        self.lines = []
+        self.sections = {}
+        self.values = {}
+
+    def value(self, path):
+        # Each field is looked up once per call, however many segments use it
+        if path in self.values:
+            return self.values[path]
+        var = f"v{len(self.values)}"
+        if path.startswith("$"):
+            self.lines.append(f"    {var} = env[{path[1:]!r}]")
+        elif "." in path:
+            section, key = path.split(".", 1)
+            if "." in key:
+                raise ValueError(f"Template fields nest at most one level deep: {path!r}")
+            self.lines.append(f"    {var} = {self.section(section)}.get({key!r}, '')")
+        else:
+            self.lines.append(f"    {var} = r.get({path!r}, '')")
+        self.values[path] = var
+        return var
+
+    def section(self, name):
+        if name not in self.sections:
+            var = f"s{len(self.sections)}"
+            self.lines.append(f"    {var} = r.get({name!r})")
+            self.lines.append(f"    if {var}.__class__ is not dict: {var} = _NO_SECTION")
+            self.sections[name] = var
+        return self.sections[name]
+
+    def field(self, spec):
+        match = _FIELD.match(spec)
+        if not match:
+            raise ValueError(f"Bad template field {{{spec}}}")
+        path, filter_name, default_kind, default = match.groups()
+        var = self.value(path)
+        expr = var
+        if default_kind == "?":
+            expr = self.lookup(path, default)
+        if filter_name:
+            if filter_name not in _FILTERS:
+                raise ValueError(f"Unknown template filter {filter_name!r}")
+            expr = f"{_FILTERS[filter_name]}({expr})"
+        if default_kind == "|":
+            expr = f"({expr} or {default!r})"
+        return var, expr
+
+    def lookup(self, path, default):
+        # The field with default in place of a missing key, looked up where it is used
+        if path.startswith("$"):
+            raise ValueError(f"Env values are never missing: {path!r}")
+        if "." in path:
+            section, key = path.split(".", 1)
+            return f"{self.section(section)}.get({key!r}, {default!r})"
+        return f"r.get({path!r}, {default!r})"
+
+    def segment(self, template):
+        # Split into required and optional parts, each a %-format plus its arguments
+        parts = []
+        fmt, args, fields, optional = [], [], [], False
+        pos = 0
+        for match in _TOKEN.finditer(template):
+            fmt.append(template[pos:match.start()].replace("%", "%%"))
+            pos = match.end()
+            token = match.group(0)
+            if token in "[]":
+                if (token == "[") == optional:
+                    raise ValueError(f"Unbalanced [ ] in template {template!r}")
+                parts.append(("".join(fmt), args, fields if optional else None))
+                fmt, args, fields, optional = [], [], [], token == "["
+            else:
+                var, expr = self.field(match.group(1))
+                fmt.append("%s")
+                args.append(expr)
+                fields.append(var)
+        if optional:
+            raise ValueError(f"Unbalanced [ ] in template {template!r}")
+        fmt.append(template[pos:].replace("%", "%%"))
+        parts.append(("".join(fmt), args, None))
+
+        exprs = []
+        for part_fmt, part_args, condition in parts:
+            if not part_fmt:
+                continue
+            if part_args:
+                expr = f"{part_fmt!r} % ({', '.join(part_args)},)"
+            else:
+                expr = repr(part_fmt.replace("%%", "%"))
+            if condition:
+                expr = f"({expr} if {' and '.join(condition)} else '')"
+            exprs.append(expr)
+        return " + ".join(exprs) or "''"
+
+
+def compile_segments(templates, name="render"):
+    # Turns a list of segment templates into render(record, env) -> [segment, ...]
+    compiler = _Compiler()
+    body = []
+    for template in templates:
+        when = None
+        if isinstance(template, tuple):
+            template, when = template
+        expr = compiler.segment(template)
+        if when:
+            condition = " or ".join(compiler.value(path) for path in when)
+            body.append(f"    if {condition}: out.append({expr})")
+        else:
+            body.append(f"    out.append({expr})")
+
+    source = "\n".join([f"def {name}(r, env):"] + compiler.lines + ["    out = []"] + body + ["    return out"])
+    namespace = {"_date": x12_date, "_NO_SECTION": {}}
+    exec(compile(source, f"<x12 template {name}>", "exec"), namespace)
+    render = namespace[name]
+    render.source = source
+    # The record's field paths it reads, in first-use order
+    render.fields = tuple(path for path in compiler.values if not path.startswith("$"))
+    return render
+
+
+# 837D (005010X224A2) segments, in the order the generators write them
+
+CLAIM_HEADER = [
+    "BHT*0019*00*{ClaimDetails.ClaimID}*{$full_date}*{$time}*CH~",
+    "NM1*41*2*Organization Name*****46*WTPID000007~",
+    "PER*IC*Help Desk*TE*18005551234~",
+    "NM1*40*2*{Payer.Name}*****46*{Payer.PayerID}~",
+]
+
+# One BHT per transaction set when claims share their provider and subscriber loops
+TRANSACTION_HEADER = ["BHT*0019*00*{$reference}*{$full_date}*{$time}*CH~"] + CLAIM_HEADER[1:]
+
+BILLING_PROVIDER_LOOP = [
+    "HL*{$hl_id}*{$hl_parent}*20*1~",
+    "NM1*85*2*{BillingProvider.ProviderName}*****XX*{BillingProvider.NPI}~",
+    "N3*{BillingProvider.Address}[*{BillingProvider.Address2}]~",
+    "N4*{BillingProvider.City}*{BillingProvider.State}*{BillingProvider.Zip}~",
+    "REF*EI*{BillingProvider.TaxID}~",
+]
+
+SUBSCRIBER_LOOP = [
+    "HL*{$hl_id}*{$hl_parent}*22*0~",
+    "SBR*S*18******MA~",
+    "NM1*IL*1*{Subscriber.LastName}*{Subscriber.FirstName}*{Subscriber.Middle}**MI*{Subscriber.SubscriberID}~",
+    "N3*{Subscriber.Address}[*{Subscriber.Address2}]~",
+    "N4*{Subscriber.City}*{Subscriber.State}*{Subscriber.Zip}~",
+    "DMG*D8*{Subscriber.DOB:date}*{Subscriber.Gender}~",
+    "NM1*PR*2*{Payer.Name}*****PI*{Payer.PayerID}~",
+]
+
+CLAIM_LOOP = [
+    "CLM*{ClaimDetails.ClaimID}*{ClaimDetails.ClaimAmount}***{ClaimDetails.PlaceOfService}:{ClaimDetails.FacilityCode|B}:1*Y*A*Y*Y*{ClaimDetails.TreatmentResultingCode|B}~",
+    "NM1*82*1*{RenderingProvider.LastName}*{RenderingProvider.FirstName}*{RenderingProvider.Middle}**XX*{RenderingProvider.NPI}~",
+    "PRV*PE*PXC*{BillingProvider.Taxonomy}~",
+]
+
+SERVICE_LINE = [
+    "LX*{$lx}~",
+    "SV3*AD:{ProcedureCode}*{Fee}**{AreaOfOralCavity}*{ReplacementIndicator}*{Quantity}*~",
+    "DTP*472*D8*{ProcedureDate:date}~",
+    ("TOO*{ToothSystem?JP}*{ToothNumber}*{ToothSurfaceCode}~", ("ToothNumber", "ToothSurfaceCode")),
+]
+
+# Changes whenever a template does, so cached renders from older templates are never reused
+TEMPLATE_VERSION = hashlib.sha1(repr(
+    (CLAIM_HEADER, TRANSACTION_HEADER, BILLING_PROVIDER_LOOP, SUBSCRIBER_LOOP, CLAIM_LOOP, SERVICE_LINE)
+).encode("utf-8")).hexdigest()[:16]
+
+render_claim_header = compile_segments(CLAIM_HEADER, "render_claim_header")
+render_transaction_header = compile_segments(TRANSACTION_HEADER, "render_transaction_header")
+render_billing_provider = compile_segments(BILLING_PROVIDER_LOOP, "render_billing_provider")
+render_subscriber = compile_segments(SUBSCRIBER_LOOP, "render_subscriber")
+render_claim_loop = compile_segments(CLAIM_LOOP, "render_claim_loop")
+render_service_line = compile_segments(SERVICE_LINE, "render_service_line")
+
+# Billing provider is always HL 1 and the subscriber HL 2 when every claim carries its own loops
+_PROVIDER_HL = {"hl_id": 1, "hl_parent": ""}
+_SUBSCRIBER_HL = {"hl_id": 2, "hl_parent": 1}
+
+
+def render_lines(claim):
+    segments = []
+    lines = claim.get("ProcedureLines") if isinstance(claim, dict) else None
+    for lx, line in enumerate(lines or (), 1):
+        segments += render_service_line(line, {"lx": lx})
+    return segments
+
+
+def render_claim_body(claim):
+    # The 2300 claim loop and its service lines, without any HL parents
+    return render_claim_loop(claim, None) + render_lines(claim)
+
+
+def render_claim_loops(claim):
+    # HL 1 through the last service line: everything that doesn't depend on when the file is written
+    segments = render_billing_provider(claim, _PROVIDER_HL)
+    segments += render_subscriber(claim, _SUBSCRIBER_HL)
+    segments += render_claim_body(claim)
+    return segments
+
+
+def render_claim(claim, full_date, time):
+    # Every segment for one claim, BHT through its last service line
+    segments = render_claim_header(claim, {"full_date": full_date, "time": time})
+    segments += render_claim_loops(claim)
+    return segments
@@ -0,0 +1,256 @@
+import argparse
+import json
+import mmap
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from pathlib import Path
+
+from x12_reader import X12FormatError, iter_segments, read_separators
+
+# Stop collecting errors for a file after this many; a broken generator would otherwise report every segment
+MAX_ERRORS = 1000
+_DATE_LENGTHS = {"%y%m%d": 6, "%Y%m%d": 8, "%H%M": 4}
+
+
+@lru_cache(maxsize=1 << 16)
+def _valid_date(value, fmt):
+    try:
+        datetime.strptime(value, fmt)
+    except ValueError:
+        return False
+    return True
+
+
+def _element(elements, index):
+    return elements[index] if index < len(elements) else ""
+
+
+class _Validator:
+    # Checks envelopes, counts, HL hierarchy, claim totals and dates in one pass
+    # over the segments. Each error is a dict with the byte offset of the
+    # offending segment, so tools can seek straight to it.
+    def __init__(self, path, max_errors):
+        self.path = str(path)
+        self.max_errors = max_errors
+        self.errors = []
+        self.isa = self.gs = self.st = None
+        self.group_count = self.transaction_count = self.segment_count = 0
+        self.hl_ids = set()
+        self.next_hl = 1
+        self.bht = None
+        self.claim = None
+
+    def error(self, offset, segment, code, message):
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"file": self.path, "offset": offset, "segment": segment,
+                                "code": code, "message": message})
+
+    def check_date(self, offset, segment, value, fmt, label):
+        if len(value) != _DATE_LENGTHS[fmt] or not value.isdigit() or not _valid_date(value, fmt):
+            self.error(offset, segment, "bad_date", f"{label} {value!r} is not a valid {fmt} date")
+
+    def close_claim(self):
+        if self.claim is None:
+            return
+        offset, amount, fees = self.claim
+        self.claim = None
+        try:
+            total = Decimal(amount)
+        except InvalidOperation:
+            self.error(offset, "CLM", "bad_amount", f"CLM02 {amount!r} is not a number")
+            return
+        if total != fees:
+            self.error(offset, "CLM", "claim_total_mismatch",
+                       f"CLM02 is {total} but the SV3 fees add up to {fees}")
+
+    def segment(self, offset, e):
+        tag = e[0]
+        if self.st is not None:
+            self.segment_count += 1
+
+        if tag == "ISA":
+            if self.isa is not None:
+                self.error(offset, tag, "missing_trailer", "ISA before the previous interchange's IEA")
+            self.isa = (offset, e[13] if len(e) > 13 else "")
+            self.group_count = 0
+            if len(e) > 10:
+                self.check_date(offset, tag, e[9], "%y%m%d", "ISA09")
+                self.check_date(offset, tag, e[10], "%H%M", "ISA10")
+
+        elif tag == "GS":
+            if self.isa is None:
+                self.error(offset, tag, "outside_envelope", "GS outside an ISA/IEA interchange")
+            if self.gs is not None:
+                self.error(offset, tag, "missing_trailer", "GS before the previous group's GE")
+            self.gs = (offset, e[6] if len(e) > 6 else "")
+            self.group_count += 1
+            self.transaction_count = 0
+            if len(e) > 5:
+                self.check_date(offset, tag, e[4], "%Y%m%d", "GS04")
+                self.check_date(offset, tag, e[5], "%H%M", "GS05")
+
+        elif tag == "ST":
+            if self.gs is None:
+                self.error(offset, tag, "outside_envelope", "ST outside a GS/GE group")
+            if self.st is not None:
+                self.error(offset, tag, "missing_trailer", "ST before the previous transaction set's SE")
+            self.st = (offset, e[2] if len(e) > 2 else "")
+            self.transaction_count += 1
+            self.segment_count = 1
+            self.hl_ids = set()
+            self.next_hl = 1
+            self.bht = None
+
+        elif tag == "SE":
+            self.close_claim()
+            if self.st is None:
+                self.error(offset, tag, "outside_envelope", "SE without a matching ST")
+                return
+            if len(e) < 3 or e[2] != self.st[1]:
+                self.error(offset, tag, "control_number_mismatch",
+                           f"SE02 {e[2] if len(e) > 2 else ''!r} does not match ST02 {self.st[1]!r}")
+            if len(e) < 2 or e[1] != str(self.segment_count):
+                self.error(offset, tag, "segment_count_mismatch",
+                           f"SE01 is {e[1] if len(e) > 1 else ''!r} but the transaction set has {self.segment_count} segments")
+            self.st = None
+
+        elif tag == "GE":
+            if self.gs is None:
+                self.error(offset, tag, "outside_envelope", "GE without a matching GS")
+                return
+            if len(e) < 3 or e[2] != self.gs[1]:
+                self.error(offset, tag, "control_number_mismatch",
+                           f"GE02 {e[2] if len(e) > 2 else ''!r} does not match GS06 {self.gs[1]!r}")
+            if len(e) < 2 or e[1] != str(self.transaction_count):
+                self.error(offset, tag, "count_mismatch",
+                           f"GE01 is {e[1] if len(e) > 1 else ''!r} but the group has {self.transaction_count} transaction sets")
+            self.gs = None
+
+        elif tag == "IEA":
+            if self.isa is None:
+                self.error(offset, tag, "outside_envelope", "IEA without a matching ISA")
+                return
+            if len(e) < 3 or e[2] != self.isa[1]:
+                self.error(offset, tag, "control_number_mismatch",
+                           f"IEA02 {e[2] if len(e) > 2 else ''!r} does not match ISA13 {self.isa[1]!r}")
+            if len(e) < 2 or e[1] != str(self.group_count):
+                self.error(offset, tag, "count_mismatch",
+                           f"IEA01 is {e[1] if len(e) > 1 else ''!r} but the interchange has {self.group_count} groups")
+            self.isa = None
+
+        elif tag == "HL":
+            self.close_claim()
+            hl_id = e[1] if len(e) > 1 else ""
+            parent = e[2] if len(e) > 2 else ""
+            if hl_id != str(self.next_hl):
+                self.error(offset, tag, "hl_sequence", f"HL01 is {hl_id!r}, expected {self.next_hl}")
+            if parent and parent not in self.hl_ids:
+                self.error(offset, tag, "hl_parent", f"HL02 {parent!r} does not refer to an earlier HL")
+            self.hl_ids.add(hl_id)
+            self.next_hl += 1
+
+        elif tag == "CLM":
+            self.close_claim()
+            self.claim = (offset, e[2] if len(e) > 2 else "", Decimal(0))
+
+        elif tag == "SV3":
+            if self.claim is None:
+                self.error(offset, tag, "outside_claim", "SV3 outside a CLM loop")
+                return
+            fee = e[2] if len(e) > 2 else ""
+            try:
+                self.claim = self.claim[:2] + (self.claim[2] + Decimal(fee),)
+            except InvalidOperation:
+                self.error(offset, tag, "bad_amount", f"SV302 {fee!r} is not a number")
+
+        elif tag == "BHT":
+            # One BHT per transaction set; HL numbering runs on across the whole ST
+            self.close_claim()
+            if self.bht is not None:
+                self.error(offset, tag, "duplicate_bht",
+                           f"Second BHT in the transaction set; the first is at byte {self.bht}")
+            self.bht = offset
+            if len(e) > 5:
+                self.check_date(offset, tag, e[4], "%Y%m%d", "BHT04")
+                self.check_date(offset, tag, e[5], "%H%M", "BHT05")
+
+        elif tag == "DMG" or tag == "DTP":
+            index = 1 if tag == "DMG" else 2
+            qualifier, value = _element(e, index), _element(e, index + 1)
+            if qualifier == "D8":
+                self.check_date(offset, tag, value, "%Y%m%d", f"{tag} date")
+            elif qualifier == "RD8":
+                start, _, end = value.partition("-")
+                self.check_date(offset, tag, start, "%Y%m%d", f"{tag} range start")
+                self.check_date(offset, tag, end, "%Y%m%d", f"{tag} range end")
+
+    def finish(self):
+        self.close_claim()
+        for opener, closer, opened in (("ST", "SE", self.st), ("GS", "GE", self.gs), ("ISA", "IEA", self.isa)):
+            if opened is not None:
+                self.error(opened[0], opener, "missing_trailer", f"File ends before the {closer} that closes this {opener}")
+
+
+def validate_file(path, max_errors=MAX_ERRORS):
+    # Returns a list of error dicts; an empty list means the file is well formed
+    validator = _Validator(path, max_errors)
+    with open(path, "rb") as f:
+        if Path(path).stat().st_size == 0:
+            validator.error(0, "", "empty_file", "File is empty")
+            return validator.errors
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            try:
+                separators = read_separators(mm)
+            except X12FormatError as e:
+                validator.error(0, "", "bad_isa", str(e))
+                return validator.errors
+            for start, _, elements in iter_segments(mm, separators):
+                validator.segment(start, elements)
+            validator.finish()
+    return validator.errors
+
+
+def validate_files(paths, workers=None, max_errors=MAX_ERRORS):
+    # {path: errors} for many files, validated in parallel processes
+    paths = [str(path) for path in paths]
+    if len(paths) <= 1 or workers == 1:
+        return {path: validate_file(path, max_errors) for path in paths}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(paths, pool.map(validate_file, paths, [max_errors] * len(paths))))
+
+
+def write_error_log(results, log_path):
+    # One JSON object per error, or the same all-clear line the project has always logged
+    log_path = Path(log_path)
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    with log_path.open("w", encoding="utf-8", newline="\r\n") as f:
+        errors = [error for file_errors in results.values() for error in file_errors]
+        if not errors:
+            f.write("No X12 errors detected.\n")
+        for error in errors:
+            f.write(json.dumps(error))
+            f.write("\n")
+    return log_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Structurally validate generated 837D files in one streaming pass.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--workers", type=int, help="validate files in this many processes")
+    parser.add_argument("--max-errors", type=int, default=MAX_ERRORS, help="errors reported per file")
+    args = parser.parse_args(argv)
+
+    results = validate_files(args.paths, args.workers, args.max_errors)
+    failed = False
+    for path, errors in results.items():
+        for error in errors:
+            print(json.dumps(error))
+        failed = failed or bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import gzip
+import io
+
+# Characters buffered by the output file handle before they are flushed to disk
+WRITE_BUFFER = 1 << 20
+
+
+def byte_length(text):
+    # isascii() is constant time, so the common all-ASCII case never encodes
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+
+class SegmentWriter:
+    # Writes X12 segments straight to an open text file, one per line, while
+    # keeping the counts the SE/GE/IEA trailers need. offset is the number of
+    # UTF-8 bytes written so far, and last_start / last_line locate the most
+    # recent write, so callers can index where each claim landed. Offsets are
+    # only exact when the file doesn't translate newlines (open it with newline="").
+    def __init__(self, f, separator="\n"):
+        self.f = f
+        self.separator = separator
+        self.segment_count = 0
+        self.transaction_sets = 0
+        self.groups = 0
+        self.offset = 0
+        self.last_start = 0
+        self.last_line = 0
+        self._st_start = 0
+
+    def write(self, segment):
+        if self.segment_count:
+            self.f.write(self.separator)
+            self.offset += len(self.separator)
+        self.f.write(segment)
+        self.last_start = self.offset
+        self.last_line = self.segment_count + 1
+        self.offset += byte_length(segment)
+        self.segment_count += 1
+
+    def write_block(self, block, count):
+        # block is count segments already joined with the separator
+        if not count:
+            return
+        if self.segment_count:
+            self.f.write(self.separator)
+            self.offset += len(self.separator)
+        self.f.write(block)
+        self.last_start = self.offset
+        self.last_line = self.segment_count + 1
+        self.offset += byte_length(block)
+        self.segment_count += count
+
+    def start_interchange(self, isa_segment):
+        self.groups = 0
+        self.write(isa_segment)
+
+    def start_transaction(self, st_segment):
+        self._st_start = self.segment_count
+        self.write(st_segment)
+        self.transaction_sets += 1
+
+    def transaction_segment_count(self):
+        # SE01 counts every segment from ST through SE, both included
+        return self.segment_count - self._st_start + 1
+
+    def start_group(self, gs_segment):
+        self.transaction_sets = 0
+        self.write(gs_segment)
+        self.groups += 1
+
+
+# Compression -> file suffix added after .txt
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+# gzip's default of 9 costs several times the CPU of 6 for a few percent smaller files
+GZIP_LEVEL = 6
+
+
+def open_x12_output(path, compression=None):
+    # A text handle for an 837D file, compressing as it streams. zstd needs the
+    # optional zstandard package, which is only imported when asked for.
+    if compression is None:
+        return open(path, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER)
+    if compression == "gzip":
+        return gzip.open(path, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8", newline="")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression needs the zstandard package: pip install zstandard") from None
+        raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8", newline="")
+    raise ValueError(f"Unknown compression: {compression} (use gzip or zstd)")